@@ -0,0 +1,286 @@
+"""
+Propagation benchmarks for the core Network and the tau.signal / tau.math operators.
+
+Run standalone to measure ticks per second and per-tick latency percentiles and write them as JSON:
+
+    PYTHONPATH=src python benchmarks/propagation.py --output results.json
+    PYTHONPATH=src python benchmarks/propagation.py --output new.json --compare results.json
+
+The same scenarios run under pytest-benchmark via benchmarks/test_propagation.py.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from tau.core import MutableSignal, Network, NetworkScheduler, HistoricalNetworkScheduler, Signal
+from tau.event import Lambda
+from tau.math import RunningSum, Min, Max, Mean, Stddev, ExponentialMovingAverage, WeightedMovingAverage, \
+    RollingSum, RollingMean, RollingVariance, RollingStddev, RollingMin, RollingMax, KeyedMean, Quantile, \
+    DecayedQuantile, Histogram, DistinctCount, RollingDistinctCount
+from tau.signal import Function, Map, Filter, Scan, BufferWithCount, BufferWithTime, WindowWithCount, \
+    WindowWithTime, SampleWithTime, AllActivated, AnyActivated, CombineLatest, Zip, fuse_chains
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+
+
+def identity(x):
+    return x
+
+
+def build_chain(network: Network, size: int) -> Tuple[List[MutableSignal], Signal]:
+    """
+    source -> Map -> Map -> ... -> Map, with size nodes in total.
+    """
+    source = MutableSignal()
+    node = source
+    for _ in range(size - 1):
+        node = Map(network, node, identity)
+    return [source], node
+
+
+def build_fan_out(network: Network, size: int) -> Tuple[List[MutableSignal], Signal]:
+    """
+    One source feeding size - 1 independent Map nodes.
+    """
+    source = MutableSignal()
+    sink = None
+    for _ in range(size - 1):
+        sink = Map(network, source, identity)
+    return [source], sink
+
+
+def build_fan_in(network: Network, size: int) -> Tuple[List[MutableSignal], Signal]:
+    """
+    size - 1 sources feeding a single Map-like sink; each tick updates one source in rotation.
+    """
+    sources = [MutableSignal() for _ in range(size - 1)]
+    sink = FanInSink(network, sources)
+    return sources, sink
+
+
+def build_diamond(network: Network, size: int) -> Tuple[List[MutableSignal], Signal]:
+    """
+    One source fanning out to size - 2 Map nodes which all fan back in to a single sink.
+    """
+    source = MutableSignal()
+    middle = [Map(network, source, identity) for _ in range(size - 2)]
+    sink = FanInSink(network, middle)
+    return [source], sink
+
+
+class FanInSink(Function):
+    """
+    Sink taking many inputs that fires whenever any of them does, without inspecting them.
+    """
+    def __init__(self, network: Network, values: List[Signal]):
+        super().__init__(network, values)
+
+    def _call(self):
+        self._update(True)
+
+
+TOPOLOGIES = {
+    'chain': build_chain,
+    'fan_out': build_fan_out,
+    'fan_in': build_fan_in,
+    'diamond': build_diamond,
+}
+
+# operator name -> builder taking (scheduler, source) and returning the operator
+OPERATORS: Dict[str, Callable[[NetworkScheduler, MutableSignal], object]] = {
+    'Map': lambda s, v: Map(s.get_network(), v, identity),
+    'Filter': lambda s, v: Filter(s.get_network(), v, lambda x: x > 0.5),
+    'Scan': lambda s, v: Scan(s.get_network(), v),
+    'BufferWithCount': lambda s, v: BufferWithCount(s.get_network(), v, 100),
+    'BufferWithTime': lambda s, v: BufferWithTime(s, v, timedelta(seconds=1)),
+    'WindowWithCount': lambda s, v: WindowWithCount(s.get_network(), v, 100),
+    'WindowWithCount(live_view)': lambda s, v: WindowWithCount(s.get_network(), v, 100, live_view=True),
+    'WindowWithTime': lambda s, v: WindowWithTime(s, v, timedelta(seconds=1)),
+    'SampleWithTime': lambda s, v: SampleWithTime(s, v, timedelta(seconds=1)),
+    'AllActivated': lambda s, v: AllActivated(s.get_network(), [v, MutableSignal()]),
+    'AnyActivated': lambda s, v: AnyActivated(s.get_network(), [v, MutableSignal()]),
+    'CombineLatest': lambda s, v: CombineLatest(s.get_network(), [v, Map(s.get_network(), v, identity)]),
+    'Zip': lambda s, v: Zip(s.get_network(), [v, v]),
+    'RunningSum': lambda s, v: RunningSum(s.get_network(), v),
+    'Min': lambda s, v: Min(s.get_network(), v),
+    'Max': lambda s, v: Max(s.get_network(), v),
+    'Mean': lambda s, v: Mean(s.get_network(), v),
+    'Stddev': lambda s, v: Stddev(s.get_network(), v),
+    'ExponentialMovingAverage': lambda s, v: ExponentialMovingAverage(s.get_network(), v),
+    'WeightedMovingAverage': lambda s, v: WeightedMovingAverage(s.get_network(), v, 0.5),
+    'RollingSum': lambda s, v: RollingSum(s.get_network(), v, 100),
+    'RollingMean': lambda s, v: RollingMean(s.get_network(), v, 100),
+    'RollingVariance': lambda s, v: RollingVariance(s.get_network(), v, 100),
+    'RollingStddev': lambda s, v: RollingStddev(s.get_network(), v, 100),
+    'RollingMin': lambda s, v: RollingMin(s.get_network(), v, 100),
+    'RollingMax': lambda s, v: RollingMax(s.get_network(), v, 100),
+    'KeyedMean': lambda s, v: KeyedMean(s.get_network(), v, lambda x: int(x) % 10000),
+    'Quantile': lambda s, v: Quantile(s.get_network(), v, [0.5, 0.99]),
+    'DecayedQuantile': lambda s, v: DecayedQuantile(s.get_network(), v, 1000, [0.5, 0.99]),
+    'Histogram': lambda s, v: Histogram(s.get_network(), v, [i / 10 for i in range(11)]),
+    'DistinctCount': lambda s, v: DistinctCount(s.get_network(), v),
+    'RollingDistinctCount': lambda s, v: RollingDistinctCount(s.get_network(), v, 1000),
+}
+
+
+def ticks_for_size(size: int, max_ticks: int) -> int:
+    """
+    Scales the tick count down for big graphs so every scenario does a similar amount of work.
+    """
+    return max(20, min(max_ticks, 2_000_000 // size))
+
+
+def summarize(latencies_ns: List[int], elapsed_ns: int) -> Dict:
+    latencies_ns = sorted(latencies_ns)
+    count = len(latencies_ns)
+
+    def percentile(p: float) -> float:
+        return latencies_ns[min(count - 1, int(p * count))] / 1000.0 if count else 0.0
+
+    return {
+        'ticks': count,
+        'ticks_per_sec': count / (elapsed_ns / 1e9) if elapsed_ns else 0.0,
+        'p50_us': percentile(0.50),
+        'p90_us': percentile(0.90),
+        'p99_us': percentile(0.99),
+        'max_us': latencies_ns[-1] / 1000.0 if count else 0.0,
+    }
+
+
+def run_direct(network: Network, sources: List[MutableSignal], ticks: int) -> Dict:
+    """
+    Sets and activates sources in rotation straight through Network.activate().
+    """
+    latencies = []
+    clock = time.perf_counter_ns
+    activate = network.activate
+    source_count = len(sources)
+    start = clock()
+    for i in range(ticks):
+        source = sources[i % source_count]
+        tick_start = clock()
+        source.set_value(float(i))
+        activate(source)
+        latencies.append(clock() - tick_start)
+    return summarize(latencies, clock() - start)
+
+
+def run_scheduled(scheduler: NetworkScheduler, sources: List[MutableSignal], sink: Signal, ticks: int) -> Dict:
+    """
+    Enqueues every tick with NetworkScheduler.schedule_update() and measures enqueue-to-sink latency, so
+    event loop overhead is included.
+    """
+    latencies = []
+    enqueue_times = deque()
+    clock = time.perf_counter_ns
+    Lambda(scheduler.get_network(), sink, lambda x: latencies.append(clock() - enqueue_times.popleft()))
+    source_count = len(sources)
+
+    async def main():
+        for i in range(ticks):
+            enqueue_times.append(clock())
+            scheduler.schedule_update(sources[i % source_count], float(i))
+            if i % 1000 == 999:
+                await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    start = clock()
+    asyncio.run(main())
+    return summarize(latencies, clock() - start)
+
+
+def bench_topology(name: str, size: int, mode: str, max_ticks: int = 10000) -> Dict:
+    ticks = ticks_for_size(size, max_ticks)
+    if mode in ('direct', 'fused'):
+        network = Network()
+        sources, _ = TOPOLOGIES[name](network, size)
+        if mode == 'fused':
+            fuse_chains(network)
+        stats = run_direct(network, sources, ticks)
+    else:
+        scheduler = NetworkScheduler()
+        sources, sink = TOPOLOGIES[name](scheduler.get_network(), size)
+        stats = run_scheduled(scheduler, sources, sink, ticks)
+    return dict(benchmark='topology', name=name, size=size, mode=mode, **stats)
+
+
+def bench_operator(name: str, max_ticks: int = 100000) -> Dict:
+    scheduler = HistoricalNetworkScheduler()
+    source = MutableSignal()
+    OPERATORS[name](scheduler, source)
+    stats = run_direct(scheduler.get_network(), [source], max_ticks)
+    return dict(benchmark='operator', name=name, size=2, mode='direct', **stats)
+
+
+def run_all(sizes: List[int], modes: List[str], max_ticks: int, operators: bool = True) -> Dict:
+    results = []
+    for name in TOPOLOGIES:
+        for size in sizes:
+            for mode in modes:
+                result = bench_topology(name, size, mode, max_ticks)
+                print(f"{name:>10} size={size:<7} {mode:>9}: {result['ticks_per_sec']:>12,.0f} ticks/s  "
+                      f"p50={result['p50_us']:.1f}us p99={result['p99_us']:.1f}us", file=sys.stderr)
+                results.append(result)
+    if operators:
+        for name in OPERATORS:
+            result = bench_operator(name, max_ticks * 10)
+            print(f"{name:>27}: {result['ticks_per_sec']:>12,.0f} ticks/s  "
+                  f"p50={result['p50_us']:.2f}us p99={result['p99_us']:.2f}us", file=sys.stderr)
+            results.append(result)
+    return {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict, baseline: Dict):
+    """
+    Prints the throughput ratio of each current result against the matching baseline result.
+    """
+    def key(result):
+        return result['benchmark'], result['name'], result['size'], result['mode']
+
+    baseline_results = {key(result): result for result in baseline['results']}
+    for result in current['results']:
+        previous = baseline_results.get(key(result))
+        if previous is not None and previous['ticks_per_sec']:
+            ratio = result['ticks_per_sec'] / previous['ticks_per_sec']
+            print(f"{'/'.join(str(k) for k in key(result)):<60} {ratio:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tau event propagation.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='graph sizes, in nodes')
+    parser.add_argument('--modes', nargs='+', choices=['direct', 'fused', 'scheduled'],
+                        default=['direct', 'scheduled'])
+    parser.add_argument('--max-ticks', type=int, default=10000, help='ticks for the smallest graphs')
+    parser.add_argument('--no-operators', action='store_true', help='skip the per-operator benchmarks')
+    parser.add_argument('--output', help='path to write JSON results to; defaults to stdout')
+    parser.add_argument('--compare', help='path to baseline JSON results to compare against')
+    args = parser.parse_args()
+
+    results = run_all(args.sizes, args.modes, args.max_ticks, not args.no_operators)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+pytest-benchmark entry points for the scenarios in propagation.py:
+
+    pip install pytest-benchmark
+    PYTHONPATH=src pytest benchmarks/ --benchmark-json=results.json
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from propagation import TOPOLOGIES, OPERATORS  # noqa: E402
+from tau.core import MutableSignal, Network, HistoricalNetworkScheduler  # noqa: E402
+
+
+def tick_all(network, sources):
+    state = {'i': 0}
+
+    def tick():
+        i = state['i']
+        source = sources[i % len(sources)]
+        source.set_value(float(i))
+        network.activate(source)
+        state['i'] = i + 1
+    return tick
+
+
+@pytest.mark.parametrize('size', [10, 1000, 10000])
+@pytest.mark.parametrize('topology', list(TOPOLOGIES))
+def test_topology(benchmark, topology, size):
+    network = Network()
+    sources, _ = TOPOLOGIES[topology](network, size)
+    benchmark(tick_all(network, sources))
+
+
+@pytest.mark.parametrize('operator', list(OPERATORS))
+def test_operator(benchmark, operator):
+    scheduler = HistoricalNetworkScheduler()
+    source = MutableSignal()
+    OPERATORS[operator](scheduler, source)
+    benchmark(tick_all(scheduler.get_network(), [source]))
@@ -15,7 +15,7 @@ async def main():
     buffer1 = BufferWithCount(network, values, count=2)
     Do(network, buffer1, lambda: print(f"buffer1 values: {buffer1.get_value()}"))
 
-    buffer2 = BufferWithTime(network, values, timedelta(seconds=5))
+    buffer2 = BufferWithTime(scheduler, values, timedelta(seconds=5))
     Do(network, buffer2, lambda: print(f"buffer2 values: {buffer2.get_value()}"))
 
 asyncio.get_event_loop().create_task(main())
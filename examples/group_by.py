@@ -0,0 +1,16 @@
+import asyncio
+
+from tau.core import NetworkScheduler
+from tau.event import Do
+from tau.math import KeyedMean
+from tau.signal import From
+
+
+async def main():
+    scheduler = NetworkScheduler()
+    network = scheduler.get_network()
+    trades = From(scheduler, [('AAPL', 310.2), ('MSFT', 160.1), ('AAPL', 311.0), ('MSFT', 159.7), ('AAPL', 309.9)])
+    avg_prices = KeyedMean(network, trades, key=lambda trade: trade[0], selector=lambda trade: trade[1])
+    Do(network, avg_prices, lambda: print(f"{avg_prices.get_value()}"))
+
+asyncio.run(main())
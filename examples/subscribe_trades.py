@@ -3,7 +3,7 @@ import json
 
 import websockets
 
-from tau.core import NetworkScheduler, MutableSignal
+from tau.core import NetworkScheduler, MutableSignal, KeepLatest
 from tau.event import Do
 from tau.signal import Map, Filter
 
@@ -21,7 +21,8 @@ async def subscribe_trades(message_callback):
             scheduler.schedule_update(message_callback, await websocket.recv())
 
 
-messages = MutableSignal()
+# bound the backlog if the feed outpaces the graph: beyond 10,000 pending messages the oldest are dropped
+messages = MutableSignal(conflation=KeepLatest(max_depth=10000))
 scheduler = NetworkScheduler()
 network = scheduler.get_network()
 
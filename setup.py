@@ -11,7 +11,6 @@ with open('HISTORY.rst', 'r') as f:
 
 
 requires = [
-    'graph-theory>=2020.4.30.58797',
     'websockets>=8.1'
 ]
 
@@ -31,6 +30,10 @@ setuptools.setup(
     include_package_data=True,
     python_requires='>=3.7.x',
     install_requires=requires,
+    extras_require={
+        'numpy': ['numpy>=1.18'],
+        'arrow': ['numpy>=1.18', 'pyarrow>=0.17']
+    },
     classifiers=(
         'Development Status :: 4 - Beta',
         'Intended Audience :: Developers',
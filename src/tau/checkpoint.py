@@ -0,0 +1,79 @@
+import os
+import struct
+from datetime import timedelta
+from typing import List
+
+from tau.core import Network, NetworkScheduler
+
+RECORD_HEADER = struct.Struct('<Q')
+
+
+class Checkpointer:
+    """
+    Periodically checkpoints a scheduler's network to a file, so a restarted process can pick up its operators'
+    accumulated state with restore() instead of replaying history to rebuild it.
+
+    Every full_every-th checkpoint is a full snapshot, which atomically replaces the file; in between, only the
+    nodes activated since the previous checkpoint are captured and appended to it. A record left incomplete by
+    a crash part way through an append is ignored when restoring.
+
+    Checkpoints are pickles, and loading one can run arbitrary code: only restore from files written by a
+    trusted process, kept where nobody untrusted can write to them.
+    """
+    def __init__(self, scheduler: NetworkScheduler, path: str, interval: timedelta, full_every: int = 10):
+        if full_every < 1:
+            raise ValueError(f"full_every must be positive: {full_every}")
+        self.network = scheduler.get_network()
+        self.path = path
+        self.full_every = full_every
+        self.checkpoints = 0
+        self.timer = scheduler.get_timer_service().schedule_periodic(interval, self.checkpoint)
+
+    def checkpoint(self):
+        """
+        Writes a checkpoint straight away.
+        """
+        incremental = self.checkpoints % self.full_every != 0 and os.path.exists(self.path)
+        snapshot = self.network.checkpoint(incremental)
+        record = RECORD_HEADER.pack(len(snapshot)) + snapshot
+        if incremental:
+            with open(self.path, 'ab') as f:
+                f.write(record)
+        else:
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(record)
+            os.replace(tmp_path, self.path)
+        self.checkpoints += 1
+
+    def cancel(self):
+        """
+        Stops checkpointing.
+        """
+        self.timer.cancel()
+
+    @staticmethod
+    def restore(network: Network, path: str):
+        """
+        Restores the network from the full snapshot and the incremental ones following it in the given file,
+        which must come from a trusted source; see Network#restore().
+        """
+        network.restore(*read_checkpoint_file(path))
+
+
+def read_checkpoint_file(path: str) -> List[bytes]:
+    """
+    :return: the snapshots in a file written by Checkpointer, in the order they were taken
+    """
+    snapshots = []
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        (length,) = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        if offset + length > len(data):
+            break
+        snapshots.append(data[offset:offset + length])
+        offset += length
+    return snapshots
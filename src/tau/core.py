@@ -1,15 +1,32 @@
 import asyncio
+import functools
+import heapq
+import itertools
+import json
+import math
+import operator
+import os
+import pickle
+import queue
+import threading
+import time
+import weakref
 from abc import ABC, abstractmethod
-from typing import Any
-
-# noinspection PyPackageRequirements
-from graph import Graph
+from collections import deque
+from datetime import timedelta
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Coroutine, Iterable, Iterator, List, Optional, \
+    Sequence, Tuple, Union
 
 
 class Event(ABC):
     """
     An action that happens at a moment in time.
     """
+    __slots__ = ('__weakref__',)
+
+    # names of the slots holding state that Network.checkpoint() saves; each class lists only its own
+    state_slots = ()
+
     @abstractmethod
     def on_activate(self) -> bool:
         """
@@ -18,11 +35,53 @@ class Event(ABC):
         """
         pass
 
+    def on_remove(self):
+        """
+        Callback made when this event is removed from its Network; releases anything that would otherwise
+        activate it again, e.g. timers.
+        """
+        pass
+
+    def get_state(self) -> tuple:
+        """
+        :return: the event's accumulated state, for checkpointing; must be picklable
+        """
+        return tuple(getattr(self, name) for name in all_state_slots(type(self)))
+
+    def set_state(self, state: tuple):
+        """
+        Restores state previously returned by get_state() on an identically constructed event.
+        """
+        for name, value in zip(all_state_slots(type(self)), state):
+            setattr(self, name, value)
+
+
+@functools.lru_cache(maxsize=None)
+def all_state_slots(cls: type) -> Tuple[str, ...]:
+    """
+    :return: the state_slots declared by the given class and all its base classes, base classes first
+    """
+    names = []
+    for base in reversed(cls.__mro__):
+        for name in base.__dict__.get('state_slots', ()):
+            if name not in names:
+                names.append(name)
+    return tuple(names)
+
 
 class Signal(Event, ABC):
     """
     An Event with a value associated with it.
+
+    A batched signal's value is a NumPy array holding a chunk of consecutive values rather than a single
+    value; operators that support batch mode process such chunks with vectorized kernels.
     """
+    __slots__ = ('value', 'modified')
+
+    state_slots = ('value',)
+
+    batched = False
+
     def __init__(self, initial_value: Any = None):
         super().__init__()
         self.value = initial_value
@@ -51,9 +110,18 @@ class Signal(Event, ABC):
 class MutableSignal(Signal):
     """
     A signal whose value can be updated programmatically.
+
+    Optionally takes a Conflation policy, which decides how updates scheduled through a NetworkScheduler
+    collapse when several are waiting for the network at once, e.g. because a feed is outpacing the graph.
+    HistoricalNetworkScheduler applies it to updates falling due at the same time, and both apply it within
+    each batch of schedule_updates() (except from an async iterator, whose updates are applied as they arrive)
+    and to updates sharing a timestamp in schedule_updates_at() and replay().
     """
-    def __init__(self, initial_value: Any = None):
+    __slots__ = ('conflation',)
+
+    def __init__(self, initial_value: Any = None, conflation: 'Conflation' = None):
         super().__init__(initial_value)
+        self.conflation = conflation
 
     def on_activate(self):
         if self.modified:
@@ -66,56 +134,588 @@ class MutableSignal(Signal):
         self._update(value)
 
 
+class Conflation(ABC):
+    """
+    Policy for collapsing the pending updates of a single MutableSignal into one scheduled activation, with
+    counters for how many updates were received, dropped or merged and how many values were delivered.
+    Each signal needs its own instance.
+    """
+    __slots__ = ('updates', 'dropped', 'merged', 'delivered')
+
+    def __init__(self):
+        self.updates = 0
+        self.dropped = 0
+        self.merged = 0
+        self.delivered = 0
+
+    @abstractmethod
+    def offer(self, value: Any) -> bool:
+        """
+        Adds a newly-scheduled value.
+
+        :return: True if nothing was pending before, so delivery needs to be scheduled
+        """
+        pass
+
+    @abstractmethod
+    def drain(self) -> List[Any]:
+        """
+        Removes and returns the pending values to deliver, oldest first.
+        """
+        pass
+
+    def stats(self) -> dict:
+        return {'updates': self.updates, 'dropped': self.dropped, 'merged': self.merged, 'delivered': self.delivered}
+
+
+class KeepLatest(Conflation):
+    """
+    Keeps at most the latest max_depth pending values, dropping the oldest beyond that. With the default
+    depth of one, only the latest value is delivered, in a single activation.
+    """
+    __slots__ = ('pending',)
+
+    def __init__(self, max_depth: int = 1):
+        super().__init__()
+        if max_depth < 1:
+            raise ValueError(f"max_depth must be positive: {max_depth}")
+        self.pending = deque(maxlen=max_depth)
+
+    def offer(self, value: Any) -> bool:
+        self.updates += 1
+        was_empty = not self.pending
+        if len(self.pending) == self.pending.maxlen:
+            self.dropped += 1
+        self.pending.append(value)
+        return was_empty
+
+    def drain(self) -> List[Any]:
+        values = list(self.pending)
+        self.pending.clear()
+        self.delivered += len(values)
+        return values
+
+
+class MergeWith(Conflation):
+    """
+    Combines pending values with a user-supplied function of (pending value, new value), delivering the
+    result in a single activation.
+    """
+    __slots__ = ('merge', 'pending', 'has_pending')
+
+    def __init__(self, merge: Callable[[Any, Any], Any]):
+        super().__init__()
+        self.merge = merge
+        self.pending = None
+        self.has_pending = False
+
+    def offer(self, value: Any) -> bool:
+        self.updates += 1
+        if self.has_pending:
+            self.pending = self.merge(self.pending, value)
+            self.merged += 1
+            return False
+        self.pending = value
+        self.has_pending = True
+        return True
+
+    def drain(self) -> List[Any]:
+        if not self.has_pending:
+            return []
+        value = self.pending
+        self.pending = None
+        self.has_pending = False
+        self.delivered += 1
+        return [value]
+
+
+class Clock(ABC):
+    """
+    A source of the current time, in seconds since the epoch.
+    """
+    @abstractmethod
+    def get_time(self) -> float:
+        pass
+
+
+class WallClock(Clock):
+    """
+    A Clock that reads the system time.
+    """
+    def get_time(self) -> float:
+        return time.time()
+
+
+class SimulatedClock(Clock):
+    """
+    A Clock that only moves when told to, for historical replay and tests.
+    """
+    def __init__(self, start_time: float = 0.0):
+        self.now = start_time
+
+    def get_time(self) -> float:
+        return self.now
+
+    def advance_to(self, timestamp: float):
+        if timestamp < self.now:
+            raise ValueError(f"cannot move clock backwards from {self.now} to {timestamp}")
+        self.now = timestamp
+
+
+CHECKPOINT_VERSION = 1
+
+
 class Network:
     """
     A graph network connecting Events.
+
+    Propagation follows a per-source plan: the nodes reachable from the source, in topological order. Plans
+    are compiled lazily on first activation, so each tick only visits the affected subgraph and activates each
+    node at most once. When connect(), disconnect() or remove() changes the graph, only the plans that can
+    reach the changed nodes are discarded, found by walking upstream from them, and each is recompiled in full
+    the next time its source fires. Adding or removing e.g. a per-instrument subgraph therefore costs time
+    proportional to everything reachable from the sources feeding it: cheap for a subgraph with its own
+    sources, but as much as the whole graph when it hangs off a feed shared by every instrument. Edges
+    themselves are added and removed in constant time.
+
+    Propagation is glitch-free: a node with several inputs is activated at most once per tick, and only after
+    every one of its inputs that is affected by the tick has already been activated, so it never sees a mix
+    of updated and stale upstream values. (Cycles are the exception; the edge closing a cycle is ignored.)
     """
     def __init__(self):
-        self.graph = Graph()
-        self.activation_flags = dict()
-        self.current_id = 0
+        # node bookkeeping is indexed by integer node ID: events[node_id] is the node itself and
+        # successors[node_id]/predecessors[node_id] hold the IDs it is connected to as the keys of a dict, in
+        # connection order, so edges can be checked for and removed in constant time; unconnected ends share an
+        # empty tuple rather than each holding an empty dict; the IDs of removed nodes are left as holes, with
+        # events[node_id] set to None, until reused
         self.node_id_map = {}
+        self.events = []
+        self.successors = []
+        self.predecessors = []
+        self.free_node_ids = []
+        self.current_tick = 0
+        self.activation_ticks = []
+        self.propagation_plans = {}
+        self.propagation_depth = 0
+        self.pending_removals = []
+        # removed events, so that activating one, e.g. from a callback already queued, does not add it back
+        self.removed_events = weakref.WeakSet()
+        self.profiler = None
+        self.checkpoint_tick = 0
 
     def attach(self, evt: Event):
         if evt in self.node_id_map:
             return
+        self.removed_events.discard(evt)
+        if self.free_node_ids:
+            node_id = self.free_node_ids.pop()
+            self.node_id_map[evt] = node_id
+            self.events[node_id] = evt
+            self.activation_ticks[node_id] = 0
         else:
-            node_id = self.__next_id()
+            node_id = len(self.events)
             self.node_id_map[evt] = node_id
-            self.graph.add_node(node_id, evt)
+            self.events.append(evt)
+            self.successors.append(())
+            self.predecessors.append(())
+            self.activation_ticks.append(0)
 
     def connect(self, evt1: Event, evt2: Event):
-        self.activation_flags[evt1] = False
-        self.activation_flags[evt2] = False
         self.attach(evt1)
         self.attach(evt2)
-        self.graph.add_edge(self.node_id_map[evt1], self.node_id_map[evt2])
+        node_id1 = self.node_id_map[evt1]
+        node_id2 = self.node_id_map[evt2]
+        successors = self.successors[node_id1]
+        if node_id2 in successors:
+            return
+        predecessors = self.predecessors[node_id2]
+
+        if successors:
+            successors[node_id2] = None
+        else:
+            self.successors[node_id1] = {node_id2: None}
+        if predecessors:
+            predecessors[node_id1] = None
+        else:
+            self.predecessors[node_id2] = {node_id1: None}
+        self.__invalidate_plans([node_id1])
 
     def disconnect(self, evt1: Event, evt2: Event):
-        del self.activation_flags[evt1]
-        del self.activation_flags[evt2]
-        self.graph.del_edge(self.node_id_map[evt1], self.node_id_map[evt2])
+        """
+        Removes the edge between two events, if there is one; both events stay in the network.
+        """
+        node_id1 = self.node_id_map[evt1]
+        node_id2 = self.node_id_map[evt2]
+        if node_id2 not in self.successors[node_id1]:
+            return
+        self.__invalidate_plans([node_id1])
+        del self.successors[node_id1][node_id2]
+        del self.predecessors[node_id2][node_id1]
+
+    def remove(self, *evts: Event):
+        """
+        Removes events, e.g. a whole per-instrument subgraph, from the network along with all of their edges;
+        events not in the network are ignored. Called during propagation, e.g. from an on_activate() callback,
+        removal is deferred until the outermost activate() call finishes, so the tick in progress runs to
+        completion against the graph it started with.
+
+        Each removed event's on_remove() is called, e.g. cancelling its timers, and activate() ignores it from
+        then on unless it is explicitly attached or connected again.
+        """
+        if self.propagation_depth:
+            self.pending_removals.extend(evts)
+            return
+
+        node_ids = list(dict.fromkeys(self.node_id_map[evt] for evt in evts if evt in self.node_id_map))
+        self.__invalidate_plans(node_ids)
+        successors = self.successors
+        predecessors = self.predecessors
+        for node_id in node_ids:
+            for successor_id in successors[node_id]:
+                if successor_id != node_id:
+                    del predecessors[successor_id][node_id]
+            for predecessor_id in predecessors[node_id]:
+                if predecessor_id != node_id:
+                    del successors[predecessor_id][node_id]
+            successors[node_id] = ()
+            predecessors[node_id] = ()
+            evt = self.events[node_id]
+            del self.node_id_map[evt]
+            self.events[node_id] = None
+            self.free_node_ids.append(node_id)
+            self.removed_events.add(evt)
+            evt.on_remove()
 
     def has_activated(self, evt: Event):
-        return self.activation_flags[evt]
+        """
+        :return: True if the given event was activated during the most recent tick
+        """
+        node_id = self.node_id_map.get(evt)
+        return node_id is not None and self.activation_ticks[node_id] == self.current_tick
+
+    def components(self) -> List[List[Event]]:
+        """
+        Finds the weakly connected components of the graph: groups of events that are linked to each other,
+        ignoring edge direction, but not to any event in another group. Each component can be run on its own.
+        """
+        components = []
+        visited = [False] * len(self.events)
+        for root_id in range(len(self.events)):
+            if visited[root_id] or self.events[root_id] is None:
+                continue
+            visited[root_id] = True
+            component = []
+            stack = [root_id]
+            while stack:
+                node_id = stack.pop()
+                component.append(self.events[node_id])
+                for neighbor_id in itertools.chain(self.successors[node_id], self.predecessors[node_id]):
+                    if not visited[neighbor_id]:
+                        visited[neighbor_id] = True
+                        stack.append(neighbor_id)
+            components.append(component)
+        return components
+
+    def checkpoint(self, incremental: bool = False) -> bytes:
+        """
+        Captures the state of every node (see Event#get_state()) in a compact binary snapshot, which restore()
+        can load into an identically constructed network, i.e. one with the same nodes created and connected
+        in the same order, e.g. by re-running the same graph-building code after a restart.
+
+        :param incremental: if True, only capture nodes activated since the previous checkpoint; restore the
+            last full snapshot followed by every incremental one taken after it
+        """
+        since_tick = self.checkpoint_tick if incremental else -1
+        activation_ticks = self.activation_ticks
+        nodes = [(node_id, type(evt).__name__, evt.get_state()) for node_id, evt in enumerate(self.events)
+                 if evt is not None and activation_ticks[node_id] > since_tick]
+        self.checkpoint_tick = self.current_tick
+        return pickle.dumps((CHECKPOINT_VERSION, incremental, len(self.events), nodes),
+                            protocol=pickle.HIGHEST_PROTOCOL)
+
+    def restore(self, *snapshots: bytes):
+        """
+        Loads node state from snapshots taken by checkpoint(), applied in the order given.
+
+        Snapshots are unpickled, which can run arbitrary code, so only restore snapshots from a trusted source,
+        e.g. files this process or a trusted one wrote, never data received from elsewhere.
+
+        :raises ValueError: if a snapshot was not taken from an identically constructed network
+        """
+        for snapshot in snapshots:
+            version, _, node_count, nodes = pickle.loads(snapshot)
+            if version != CHECKPOINT_VERSION:
+                raise ValueError(f"unsupported checkpoint version: {version}")
+            if node_count != len(self.events):
+                raise ValueError(f"checkpoint has {node_count} nodes but the network has {len(self.events)}")
+            for node_id, type_name, state in nodes:
+                evt = self.events[node_id]
+                if evt is None or type(evt).__name__ != type_name:
+                    raise ValueError(f"checkpoint node {node_id} is a {type_name}, not a {type(evt).__name__}")
+                evt.set_state(state)
+        self.checkpoint_tick = self.current_tick
+
+    def enable_profiling(self, profiler: 'NetworkProfiler' = None) -> 'NetworkProfiler':
+        """
+        Starts recording per-node and per-tick statistics for every activation.
+
+        :param profiler: the profiler to record into; a new one by default
+        :return: the profiler now attached to this network
+        """
+        self.profiler = profiler if profiler is not None else NetworkProfiler(self)
+        return self.profiler
+
+    def disable_profiling(self):
+        self.profiler = None
 
-    # noinspection PyCallingNonCallable
     def activate(self, evt: Event):
-        self.__clear_activation_flags()
+        plan = self.propagation_plans.get(evt)
+        if plan is None:
+            if evt in self.removed_events:
+                return
+            plan = self.__compile_plan(evt)
+            self.propagation_plans[evt] = plan
+        events, node_ids, children, depths = plan
+
+        self.current_tick += 1
+        tick = self.current_tick
+        self.propagation_depth += 1
+        try:
+            if self.profiler is not None:
+                self.__activate_profiled(events, node_ids, children, depths, tick)
+                return
+
+            activation_ticks = self.activation_ticks
+            pending = [False] * len(events)
+            pending[0] = True
+            for i, current_evt in enumerate(events):
+                if pending[i]:
+                    activation_ticks[node_ids[i]] = tick
+                    if current_evt.on_activate():
+                        for j in children[i]:
+                            pending[j] = True
+        finally:
+            self.propagation_depth -= 1
+            if self.pending_removals and not self.propagation_depth:
+                removals = self.pending_removals
+                self.pending_removals = []
+                self.remove(*removals)
 
-        def scan_nodes(node_id) -> bool:
-            current_evt = self.graph.node(node_id)
-            self.activation_flags[current_evt] = True
-            return current_evt.on_activate()
+    def __activate_profiled(self, events: List[Event], node_ids: List[int], children: List[Tuple[int, ...]],
+                            depths: List[int], tick: int):
+        profiler = self.profiler
+        activation_ticks = self.activation_ticks
+        clock = time.perf_counter_ns
+        activated = 0
+        max_depth = 0
 
-        self.graph.depth_scan(self.node_id_map[evt], scan_nodes)
+        pending = [False] * len(events)
+        pending[0] = True
+        for i, current_evt in enumerate(events):
+            if pending[i]:
+                activation_ticks[node_ids[i]] = tick
+                start = clock()
+                fired = current_evt.on_activate()
+                profiler.record_activation(current_evt, clock() - start, fired)
+                activated += 1
+                if depths[i] > max_depth:
+                    max_depth = depths[i]
+                if fired:
+                    for j in children[i]:
+                        pending[j] = True
+        profiler.record_tick(max_depth, activated - 1)
 
-    def __next_id(self):
-        self.current_id += 1
-        return self.current_id
+    def __invalidate_plans(self, node_ids: List[int]):
+        """
+        Discards the propagation plans of the given nodes and of every node upstream of them, i.e. every plan
+        that can include them.
+        """
+        plans = self.propagation_plans
+        if not plans:
+            return
+        events = self.events
+        predecessors = self.predecessors
+        visited = set(node_ids)
+        stack = list(visited)
+        while stack:
+            node_id = stack.pop()
+            plans.pop(events[node_id], None)
+            for predecessor_id in predecessors[node_id]:
+                if predecessor_id not in visited:
+                    visited.add(predecessor_id)
+                    stack.append(predecessor_id)
+
+    def __compile_plan(self, evt: Event):
+        """
+        Builds the propagation plan for a source event: the list of events reachable from it in topological
+        order, plus for each one its node ID, the plan indices of its downstream events and its depth below
+        the source.
+        Edges closing a cycle are dropped, so every event runs at most once per tick.
+        """
+        if evt not in self.node_id_map:
+            self.attach(evt)
+        root_id = self.node_id_map[evt]
+        successors = self.successors
+
+        # reverse post-order of a depth-first search is a topological order; successors are pushed in
+        # reverse so siblings keep the order in which they were connected
+        post_order = []
+        visited = {root_id}
+        stack = [(root_id, reversed(tuple(successors[root_id])))]
+        while stack:
+            node_id, pending = stack[-1]
+            for successor_id in pending:
+                if successor_id not in visited:
+                    visited.add(successor_id)
+                    stack.append((successor_id, reversed(tuple(successors[successor_id]))))
+                    break
+            else:
+                stack.pop()
+                post_order.append(node_id)
+        post_order.reverse()
+
+        rank = {node_id: i for i, node_id in enumerate(post_order)}
+        events = [self.events[node_id] for node_id in post_order]
+        children = [tuple(sorted(rank[successor_id] for successor_id in successors[node_id]
+                                 if rank[successor_id] > i))
+                    for i, node_id in enumerate(post_order)]
+
+        # longest path from the source to each event, for profiling
+        depths = [0] * len(events)
+        for i, downstream in enumerate(children):
+            for j in downstream:
+                if depths[i] + 1 > depths[j]:
+                    depths[j] = depths[i] + 1
+        return events, post_order, children, depths
+
+
+class NodeStats:
+    """
+    Activation statistics for a single node, as recorded by a NetworkProfiler.
+    """
+    def __init__(self):
+        self.activations = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.fired = 0
+        self.not_fired = 0
+
+
+class NetworkProfiler:
+    """
+    Records, for each node, how often it was activated, how long its on_activate() took and how often it
+    returned True or False, plus the depth and fan-out of each tick's propagation. Attach one with
+    Network#enable_profiling(); when no profiler is attached activation pays only a single None check.
+    """
+    def __init__(self, network: Network):
+        self.network = network
+        self.node_stats = {}
+        self.ticks = 0
+        self.total_depth = 0
+        self.max_depth = 0
+        self.total_fan_out = 0
+        self.max_fan_out = 0
 
-    def __clear_activation_flags(self):
-        self.activation_flags = self.activation_flags.fromkeys(self.activation_flags, False)
+    def record_activation(self, evt: Event, elapsed_ns: int, fired: bool):
+        stats = self.node_stats.get(evt)
+        if stats is None:
+            stats = self.node_stats[evt] = NodeStats()
+        stats.activations += 1
+        stats.total_ns += elapsed_ns
+        if elapsed_ns > stats.max_ns:
+            stats.max_ns = elapsed_ns
+        if fired:
+            stats.fired += 1
+        else:
+            stats.not_fired += 1
+
+    def record_tick(self, depth: int, fan_out: int):
+        """
+        :param depth: longest path from the source to any node activated during the tick
+        :param fan_out: number of nodes activated downstream of the source during the tick
+        """
+        self.ticks += 1
+        self.total_depth += depth
+        self.total_fan_out += fan_out
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if fan_out > self.max_fan_out:
+            self.max_fan_out = fan_out
+
+    def reset(self):
+        self.node_stats.clear()
+        self.ticks = 0
+        self.total_depth = 0
+        self.max_depth = 0
+        self.total_fan_out = 0
+        self.max_fan_out = 0
+
+    def snapshot(self) -> dict:
+        """
+        :return: a JSON-serializable copy of the statistics so far, nodes ordered by total time spent
+        """
+        nodes = []
+        for evt, stats in self.node_stats.items():
+            nodes.append({
+                'node_id': self.network.node_id_map.get(evt),
+                'type': type(evt).__name__,
+                'activations': stats.activations,
+                'total_ns': stats.total_ns,
+                'mean_ns': stats.total_ns / stats.activations,
+                'max_ns': stats.max_ns,
+                'fired': stats.fired,
+                'not_fired': stats.not_fired,
+            })
+        nodes.sort(key=lambda node: node['total_ns'], reverse=True)
+        return {
+            'ticks': self.ticks,
+            'depth': {'mean': self.total_depth / self.ticks if self.ticks else 0.0, 'max': self.max_depth},
+            'fan_out': {'mean': self.total_fan_out / self.ticks if self.ticks else 0.0, 'max': self.max_fan_out},
+            'nodes': nodes,
+        }
+
+    def write_json(self, path: str):
+        snapshot = self.snapshot()
+        self.__write_atomically(path, json.dumps(snapshot, indent=2))
+
+    def write_prometheus(self, path: str):
+        """
+        Writes the statistics in the Prometheus text exposition format, e.g. for node_exporter's textfile
+        collector.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            '# HELP tau_ticks_total Propagation ticks recorded.',
+            '# TYPE tau_ticks_total counter',
+            f"tau_ticks_total {snapshot['ticks']}",
+            '# HELP tau_tick_depth_max Longest propagation path seen in a single tick.',
+            '# TYPE tau_tick_depth_max gauge',
+            f"tau_tick_depth_max {snapshot['depth']['max']}",
+            '# HELP tau_tick_fan_out_max Most nodes activated downstream of a source in a single tick.',
+            '# TYPE tau_tick_fan_out_max gauge',
+            f"tau_tick_fan_out_max {snapshot['fan_out']['max']}",
+            '# HELP tau_node_activations_total Node activations, by whether on_activate() returned True.',
+            '# TYPE tau_node_activations_total counter',
+        ]
+        for node in snapshot['nodes']:
+            labels = f'node="{node["node_id"]}",type="{node["type"]}"'
+            lines.append(f'tau_node_activations_total{{{labels},fired="true"}} {node["fired"]}')
+            lines.append(f'tau_node_activations_total{{{labels},fired="false"}} {node["not_fired"]}')
+        lines.extend([
+            '# HELP tau_node_activation_seconds_total Time spent in node on_activate() calls.',
+            '# TYPE tau_node_activation_seconds_total counter',
+        ])
+        for node in snapshot['nodes']:
+            labels = f'node="{node["node_id"]}",type="{node["type"]}"'
+            lines.append(f'tau_node_activation_seconds_total{{{labels}}} {node["total_ns"] / 1e9}')
+        self.__write_atomically(path, '\n'.join(lines) + '\n')
+
+    @staticmethod
+    def __write_atomically(path: str, text: str):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
 
 
 class NetworkScheduler:
@@ -123,17 +723,707 @@ class NetworkScheduler:
     A higher-level scheduler object sitting on top of asyncio that provides natural operations for
     scheduling events connected in a Network.
     """
-    def __init__(self, network: Network = Network()):
-        self.network = network
+    def __init__(self, network: Network = None, clock: Clock = None):
+        self.network = network if network is not None else Network()
+        self.clock = clock if clock is not None else WallClock()
+        self.pending_tasks = set()
+        self.timer_service = None
 
     def get_network(self):
         return self.network
 
+    def get_clock(self) -> Clock:
+        return self.clock
+
+    def get_time(self) -> float:
+        return self.clock.get_time()
+
+    def schedule_timer(self, delay: timedelta, callback: Callable[[], Any]):
+        """
+        Calls back once after the given delay; all time-based operators should schedule through here so
+        alternate schedulers can control the passage of time.
+
+        :returns: a handle whose cancel() method prevents the callback from running
+        """
+        return asyncio.get_event_loop().call_later(delay.total_seconds(), callback)
+
+    def get_timer_service(self) -> 'TimerService':
+        """
+        :return: the timer service shared by all time-based operators running on this scheduler
+        """
+        if self.timer_service is None:
+            self.timer_service = TimerService(self)
+        return self.timer_service
+
+    def schedule_update_at(self, signal: MutableSignal, value: Any, timestamp: float):
+        """
+        Sets the signal's value and activates it once the clock reaches the given timestamp.
+        """
+        def set_and_activate():
+            signal.set_value(value)
+            self.network.activate(signal)
+        delay = max(timestamp - self.get_time(), 0.0)
+        asyncio.get_event_loop().call_later(delay, set_and_activate)
+
     def schedule_event(self, evt: Event):
         asyncio.get_event_loop().call_soon(lambda: self.network.activate(evt))
 
     def schedule_update(self, signal: MutableSignal, value: Any):
+        conflation = signal.conflation
+        if conflation is not None:
+            if conflation.offer(value):
+                asyncio.get_event_loop().call_soon(deliver_conflated, self.network, signal)
+            return
+
         def set_and_activate():
             signal.set_value(value)
             self.network.activate(signal)
         asyncio.get_event_loop().call_soon(set_and_activate)
+
+    def schedule_updates(self, updates: Union[Iterable[Tuple[MutableSignal, Any]],
+                                              AsyncIterable[Tuple[MutableSignal, Any]]],
+                         batch_size: int = 1000) -> asyncio.Future:
+        """
+        Drains a (possibly lazy) stream of (signal, value) pairs into the network. Updates are applied and
+        propagated inline, in order, batch_size at a time, rather than queueing a separate callback per value.
+
+        A sequence, e.g. a list, is already in memory, so a callback per batch is queued straight away; like
+        those of schedule_update(), they run even if nothing waits for them, e.g. when the coroutine passed to
+        asyncio.run() returns first. Anything else -- an iterator, generator or async iterator -- is pulled
+        lazily by a Task that yields back to the event loop after every batch; asyncio.run() cancels Tasks
+        still running when it returns, so await it to be sure every update is applied. Updates from an async
+        iterator are applied one by one as they arrive, so Conflation policies do not collapse them.
+
+        :param updates: a sequence, iterable, generator or async iterator of (signal, value) pairs
+        :param batch_size: number of updates to apply between yields to the event loop
+        :returns: a future completing once every update has been applied
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive: {batch_size}")
+
+        network = self.network
+        if isinstance(updates, Sequence):
+            loop = asyncio.get_event_loop()
+            for start in range(0, len(updates), batch_size):
+                loop.call_soon(apply_updates_slice, network, updates, start, start + batch_size)
+            done = loop.create_future()
+            loop.call_soon(lambda: done.done() or done.set_result(None))
+            return done
+
+        if hasattr(updates, '__aiter__'):
+            return self.spawn(feed_async_iterable(network, None, updates, batch_size))
+
+        async def drain():
+            iterator = iter(updates)
+            while apply_updates(network, itertools.islice(iterator, batch_size)) == batch_size:
+                await asyncio.sleep(0)
+
+        return self.spawn(drain())
+
+    def schedule_updates_at(self, updates: Iterable[Tuple[float, MutableSignal, Any]],
+                            batch_size: int = 1000) -> asyncio.Task:
+        """
+        Replays a lazy, time-ordered iterable of (timestamp, signal, value) updates, waiting until the clock
+        reaches each timestamp; updates whose time has already passed are applied straight away, yielding to
+        the event loop every batch_size updates. Updates sharing a timestamp collapse according to their
+        signal's Conflation policy, if any, and are delivered once the next timestamp comes up.
+
+        :returns: the Task draining the updates
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive: {batch_size}")
+
+        network = self.network
+
+        async def drain():
+            count = 0
+            previous_timestamp = None
+            conflated = []
+            try:
+                for timestamp, signal, value in updates:
+                    if timestamp != previous_timestamp:
+                        # everything due at the previous time has been offered to its signal's Conflation
+                        deliver_conflated_signals(network, conflated)
+                        previous_timestamp = timestamp
+                    delay = timestamp - self.get_time()
+                    if delay > 0:
+                        count = 0
+                        await asyncio.sleep(delay)
+                    conflation = signal.conflation
+                    if conflation is None:
+                        signal.set_value(value)
+                        network.activate(signal)
+                    elif conflation.offer(value):
+                        conflated.append(signal)
+                    count += 1
+                    if count == batch_size:
+                        count = 0
+                        await asyncio.sleep(0)
+            finally:
+                deliver_conflated_signals(network, conflated)
+
+        return self.spawn(drain())
+
+    def replay(self, *streams: Iterable[Tuple[float, MutableSignal, Any]], batch_size: int = 1000):
+        """
+        Replays any number of time-ordered (timestamp, signal, value) streams, e.g. trades, quotes and reference
+        prices from separate files, as a single stream in global timestamp order. See merge_updates().
+
+        :returns: whatever schedule_updates_at() returns for the merged stream
+        """
+        return self.schedule_updates_at(merge_updates(*streams), batch_size)
+
+    def create_ingestion_queue(self, maxsize: int = 10000, batch_size: int = 1000) -> 'IngestionQueue':
+        """
+        Creates a queue through which other threads can feed updates into this scheduler's network; call from
+        the thread running the event loop. See IngestionQueue.
+        """
+        return IngestionQueue(self, maxsize, batch_size)
+
+    def spawn(self, coro: Coroutine) -> asyncio.Task:
+        """
+        Runs a coroutine as a Task on the event loop, holding a reference to it until it completes so it
+        cannot be garbage collected part way through.
+        """
+        task = asyncio.get_event_loop().create_task(coro)
+        self.pending_tasks.add(task)
+        task.add_done_callback(self.pending_tasks.discard)
+        return task
+
+
+def merge_updates(*streams: Iterable[Tuple[float, MutableSignal, Any]]) -> Iterator[Tuple[float, MutableSignal, Any]]:
+    """
+    Lazily k-way merges time-ordered (timestamp, signal, value) streams into one, using a heap holding just the
+    next update from each stream, so hundreds of streams can be merged without reading any of them ahead.
+    Updates with equal timestamps come out in the order the streams were given, then in stream order.
+    """
+    return heapq.merge(*streams, key=operator.itemgetter(0))
+
+
+def apply_updates(network: Network, updates: Iterable[Tuple[MutableSignal, Any]]) -> int:
+    """
+    Sets each signal's value in turn and propagates it through the network. Values for a signal with a
+    Conflation policy are offered to it instead and delivered once the rest have been applied, so a signal's
+    updates within one batch collapse as if each had been scheduled with schedule_update().
+
+    :return: the number of updates applied
+    """
+    count = 0
+    conflated = []
+    try:
+        for signal, value in updates:
+            count += 1
+            conflation = signal.conflation
+            if conflation is None:
+                signal.set_value(value)
+                network.activate(signal)
+            elif conflation.offer(value):
+                conflated.append(signal)
+    finally:
+        for signal in conflated:
+            deliver_conflated(network, signal)
+    return count
+
+
+def deliver_conflated(network: Network, signal: MutableSignal):
+    """
+    Sets and propagates the values pending in a signal's Conflation policy.
+    """
+    for value in signal.conflation.drain():
+        signal.set_value(value)
+        network.activate(signal)
+
+
+def deliver_conflated_signals(network: Network, signals: List[MutableSignal]):
+    """
+    Delivers the values pending in each of the given signals' Conflation policies, in turn, emptying the list.
+    """
+    pending = signals.copy()
+    signals.clear()
+    for signal in pending:
+        deliver_conflated(network, signal)
+
+
+def apply_updates_slice(network: Network, updates: Sequence[Tuple[MutableSignal, Any]], start: int, stop: int):
+    # slices are only taken as each batch comes due, so queued batches do not copy the sequence up front
+    apply_updates(network, updates[start:stop])
+
+
+async def close_async_iterator(iterator: AsyncIterator):
+    """
+    Closes an async iterator that supports it (e.g. an async generator), running its cleanup code.
+    """
+    aclose = getattr(iterator, 'aclose', None)
+    if aclose is not None:
+        await aclose()
+
+
+async def feed_async_iterable(network: Network, signal: Optional[MutableSignal],
+                              values: Union[AsyncIterable, asyncio.Queue], batch_size: int):
+    """
+    Sets the signal to each value from an async iterable or asyncio.Queue in turn, activating the network
+    inline, and yields to the event loop after every batch_size values; if signal is None, the values are
+    (signal, value) pairs instead. Values arrive one at a time, so those for a signal with a Conflation policy
+    are delivered as they come rather than collapsed. The source is closed when it runs out, when the calling
+    task is cancelled or when propagation raises.
+    """
+    iterator = queue_values(values) if isinstance(values, asyncio.Queue) else values.__aiter__()
+    count = 0
+    try:
+        async for value in iterator:
+            target = signal
+            if target is None:
+                target, value = value
+            conflation = target.conflation
+            if conflation is None:
+                target.set_value(value)
+                network.activate(target)
+            elif conflation.offer(value):
+                deliver_conflated(network, target)
+            count += 1
+            if count == batch_size:
+                count = 0
+                await asyncio.sleep(0)
+    finally:
+        await close_async_iterator(iterator)
+
+
+async def queue_values(queue: asyncio.Queue):
+    while True:
+        yield await queue.get()
+
+
+class IngestionQueue:
+    """
+    A bounded, thread-safe queue for feeding (signal, value) updates into a NetworkScheduler from producer
+    threads, e.g. blocking socket or C-extension feed handlers. Producers call put() from any thread; the event
+    loop is woken with a single call_soon_threadsafe() when the queue goes from idle to non-empty, then drains
+    it in batches of up to batch_size updates per loop iteration until it is empty again, so a busy feed costs
+    one wake-up per burst rather than one per message.
+
+    Once maxsize updates are waiting, put() blocks until the loop catches up, or raises queue.Full if asked
+    not to block, pushing back on the producers. Every update is applied, in order; signals' Conflation
+    policies do not apply here.
+    """
+    def __init__(self, scheduler: NetworkScheduler, maxsize: int = 10000, batch_size: int = 1000):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be positive: {maxsize}")
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive: {batch_size}")
+        self.scheduler = scheduler
+        self.loop = asyncio.get_event_loop()
+        self.loop_thread = threading.get_ident()
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.updates = deque()
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.drain_scheduled = False
+
+        self.enqueued = 0
+        self.delivered = 0
+        self.wakeups = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def put(self, signal: MutableSignal, value: Any, block: bool = True, timeout: float = None):
+        """
+        Queues an update; safe to call from any thread. Only the event loop drains the queue, so on the thread
+        running it put() can never wait for space: call it with block=False there and handle queue.Full.
+
+        :param block: if the queue is full, wait for space (for at most timeout seconds, if given) rather than
+            raising queue.Full straight away
+        :raises RuntimeError: if asked to block on the event loop thread while the queue is full, which would
+            deadlock
+        """
+        with self.not_full:
+            if len(self.updates) >= self.maxsize:
+                if not block:
+                    raise queue.Full
+                if threading.get_ident() == self.loop_thread:
+                    raise RuntimeError("put() cannot wait for space on the event loop thread; use block=False")
+                if not self.not_full.wait_for(lambda: len(self.updates) < self.maxsize, timeout):
+                    raise queue.Full
+            # the loop swaps in a fresh deque when it takes everything, so look it up again after waiting
+            updates = self.updates
+            updates.append((time.perf_counter(), signal, value))
+            self.enqueued += 1
+            if len(updates) > self.max_depth:
+                self.max_depth = len(updates)
+            wake = not self.drain_scheduled
+            if wake:
+                self.drain_scheduled = True
+                self.wakeups += 1
+        if wake:
+            self.loop.call_soon_threadsafe(self.__drain)
+
+    def qsize(self) -> int:
+        return len(self.updates)
+
+    def stats(self) -> dict:
+        """
+        :return: queue depth and how long delivered updates waited in the queue, in seconds
+        """
+        return {
+            'depth': len(self.updates),
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'delivered': self.delivered,
+            'wakeups': self.wakeups,
+            'batches': self.batches,
+            'mean_wait': self.total_wait / self.delivered if self.delivered else 0.0,
+            'max_wait': self.max_wait,
+        }
+
+    def __drain(self):
+        with self.not_full:
+            updates = self.updates
+            if len(updates) <= self.batch_size:
+                batch = updates
+                self.updates = deque()
+            else:
+                batch = deque(updates.popleft() for _ in range(self.batch_size))
+            self.not_full.notify_all()
+
+        network = self.scheduler.get_network()
+        now = time.perf_counter()
+        delivered = 0
+        total_wait = 0.0
+        max_wait = self.max_wait
+        try:
+            while batch:
+                enqueued_at, signal, value = batch.popleft()
+                delivered += 1
+                wait = now - enqueued_at
+                total_wait += wait
+                if wait > max_wait:
+                    max_wait = wait
+                signal.set_value(value)
+                network.activate(signal)
+        finally:
+            self.total_wait += total_wait
+            self.max_wait = max_wait
+            self.delivered += delivered
+            self.batches += 1
+            with self.lock:
+                # if propagation raised, the error goes to the loop's exception handler and the rest of the
+                # batch goes back to the front of the queue, to be delivered in order by the next drain
+                if batch:
+                    self.updates.extendleft(reversed(batch))
+                if self.updates:
+                    self.loop.call_soon(self.__drain)
+                else:
+                    self.drain_scheduled = False
+
+
+class ScheduledCallback:
+    """
+    A cancellable callback queued on a HistoricalNetworkScheduler; timer marks those queued by schedule_timer().
+    """
+    def __init__(self, callback: Callable[[], Any], timer: bool = False):
+        self.callback = callback
+        self.timer = timer
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Timer:
+    """
+    A one-shot or periodic timer registered with a TimerService.
+    """
+    __slots__ = ('callback', 'period', 'sequence', 'cancelled')
+
+    def __init__(self, callback: Callable[[], Any], period: int, sequence: int):
+        self.callback = callback
+        self.period = period
+        self.sequence = sequence
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerService:
+    """
+    A single timer shared by any number of time-based operators. Deadlines are rounded up to whole ticks of the
+    given resolution and kept in a heap; only the earliest one is ever armed with the scheduler, through
+    schedule_timer(), so thousands of operators cost one pending callback rather than one each. Timers due in
+    the same tick fire in the order they were created.
+
+    Periodic timers fire at fixed multiples of their period, so they do not drift. By default they are also
+    aligned to the clock, i.e. fire at times that are exact multiples of the period, which puts every timer
+    with the same period into the same tick and gives time buckets round boundaries.
+    """
+    def __init__(self, scheduler: NetworkScheduler, resolution: timedelta = timedelta(milliseconds=1)):
+        if resolution <= timedelta(0):
+            raise ValueError(f"resolution must be positive: {resolution}")
+        self.scheduler = scheduler
+        self.resolution = resolution.total_seconds()
+        self.deadlines = []
+        self.sequence = 0
+        self.armed_tick = None
+        self.armed_handle = None
+
+    def schedule(self, delay: timedelta, callback: Callable[[], Any]) -> Timer:
+        """
+        Calls back once, after at least the given delay.
+        """
+        tick = self.__to_tick(self.scheduler.get_time() + delay.total_seconds())
+        return self.__add(tick, Timer(callback, 0, self.__next_sequence()))
+
+    def schedule_periodic(self, interval: timedelta, callback: Callable[[], Any], align: bool = True) -> Timer:
+        """
+        Calls back every interval until the returned timer is cancelled. If the scheduler falls behind by more
+        than a period, missed firings are skipped rather than run back-to-back.
+
+        :param align: if True, fire at multiples of the interval since the epoch rather than of the interval
+            since now
+        """
+        period = max(1, round(interval.total_seconds() / self.resolution))
+        if align:
+            tick = (self.__current_tick() // period + 1) * period
+        else:
+            tick = self.__to_tick(self.scheduler.get_time()) + period
+        return self.__add(tick, Timer(callback, period, self.__next_sequence()))
+
+    def periodic_horizon(self) -> Union[float, None]:
+        """
+        :return: the time by which every live periodic timer will have fired at least once more, or None if a
+            one-shot timer is still pending
+        """
+        horizon = self.scheduler.get_time()
+        for tick, _, timer in self.deadlines:
+            if timer.cancelled:
+                continue
+            if not timer.period:
+                return None
+            horizon = max(horizon, tick * self.resolution)
+        return horizon
+
+    def __add(self, tick: int, timer: Timer) -> Timer:
+        heapq.heappush(self.deadlines, (tick, timer.sequence, timer))
+        if self.armed_tick is None or tick < self.armed_tick:
+            self.__arm(tick)
+        return timer
+
+    def __arm(self, tick: int):
+        if self.armed_handle is not None:
+            self.armed_handle.cancel()
+        delay = max(tick * self.resolution - self.scheduler.get_time(), 0.0)
+        self.armed_tick = tick
+        self.armed_handle = self.scheduler.schedule_timer(timedelta(seconds=delay), self.__fire)
+
+    def __fire(self):
+        # everything up to the armed tick is due even if the clock reads marginally earlier
+        due_tick = max(self.armed_tick, self.__current_tick())
+        self.armed_tick = None
+        self.armed_handle = None
+        deadlines = self.deadlines
+        while deadlines and deadlines[0][0] <= due_tick:
+            tick, _, timer = heapq.heappop(deadlines)
+            if timer.cancelled:
+                continue
+            if timer.period:
+                next_tick = tick + timer.period
+                if next_tick <= due_tick:
+                    next_tick = due_tick - (due_tick - tick) % timer.period + timer.period
+                heapq.heappush(deadlines, (next_tick, timer.sequence, timer))
+            timer.callback()
+        if deadlines and (self.armed_tick is None or deadlines[0][0] < self.armed_tick):
+            self.__arm(deadlines[0][0])
+
+    def __current_tick(self) -> int:
+        return math.floor(self.scheduler.get_time() / self.resolution + 1e-6)
+
+    def __to_tick(self, timestamp: float) -> int:
+        return math.ceil(timestamp / self.resolution - 1e-6)
+
+    def __next_sequence(self) -> int:
+        self.sequence += 1
+        return self.sequence
+
+
+class HistoricalNetworkScheduler(NetworkScheduler):
+    """
+    A NetworkScheduler driven by a SimulatedClock rather than the asyncio event loop. Every update and timer
+    goes into a single queue ordered by (timestamp, scheduling order), and run() jumps the clock straight to
+    each entry in turn, so replays go as fast as the CPU allows and are fully reproducible.
+
+    Only synchronous sources can be replayed this way: schedule_updates() rejects async iterators.
+    """
+    def __init__(self, network: Network = None, clock: SimulatedClock = None):
+        super().__init__(network, clock if clock is not None else SimulatedClock())
+        self.queue = []
+        self.sequence = 0
+        self.until = None
+        self.update_streams = deque()
+        # queued entries other than those from schedule_timer(), whether or not cancelled
+        self.data_entries = 0
+
+    def schedule_event(self, evt: Event):
+        self.__enqueue(self.get_time(), lambda: self.network.activate(evt))
+
+    def schedule_update(self, signal: MutableSignal, value: Any):
+        conflation = signal.conflation
+        if conflation is not None:
+            # as on a live NetworkScheduler, values offered before the delivery comes round collapse into it
+            if conflation.offer(value):
+                self.__enqueue(self.get_time(), lambda: deliver_conflated(self.network, signal))
+            return
+        self.schedule_update_at(signal, value, self.get_time())
+
+    def schedule_update_at(self, signal: MutableSignal, value: Any, timestamp: float):
+        """
+        Sets the signal's value and activates it at the given time. If the signal has a Conflation policy, the
+        value is offered to it when it comes due instead, and delivered after everything else already queued
+        for that time, so updates falling due together collapse as they do on a live NetworkScheduler.
+        """
+        if timestamp < self.get_time():
+            raise ValueError(f"cannot schedule update at {timestamp}, before current time {self.get_time()}")
+
+        def set_and_activate():
+            conflation = signal.conflation
+            if conflation is None:
+                signal.set_value(value)
+                self.network.activate(signal)
+            elif conflation.offer(value):
+                self.__enqueue(self.get_time(), lambda: deliver_conflated(self.network, signal))
+        self.__enqueue(timestamp, set_and_activate)
+
+    def schedule_updates(self, updates: Iterable[Tuple[MutableSignal, Any]], batch_size: int = 1000) -> None:
+        """
+        Drains a (possibly lazy) iterable of (signal, value) pairs at the current simulated time, batch_size
+        updates per queue entry so that timers and other sources due at the same time interleave fairly.
+        Iterables scheduled while earlier ones are still draining wait for them to finish, so updates are
+        applied in the order they were scheduled, as with NetworkScheduler.
+        """
+        if hasattr(updates, '__aiter__'):
+            raise TypeError("HistoricalNetworkScheduler cannot replay async iterators")
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive: {batch_size}")
+
+        self.update_streams.append((iter(updates), batch_size))
+        if len(self.update_streams) == 1:
+            self.__enqueue(self.get_time(), self.__drain_update_streams)
+
+    def __drain_update_streams(self):
+        streams = self.update_streams
+        iterator, batch_size = streams[0]
+        try:
+            if apply_updates(self.network, itertools.islice(iterator, batch_size)) < batch_size:
+                streams.popleft()
+        except BaseException:
+            streams.popleft()
+            raise
+        finally:
+            if streams:
+                self.__enqueue(self.get_time(), self.__drain_update_streams)
+
+    def schedule_updates_at(self, updates: Iterable[Tuple[float, MutableSignal, Any]], batch_size: int = 1000):
+        """
+        Replays a lazy, time-ordered iterable of (timestamp, signal, value) updates. Only the next pending
+        update sits in the queue at any time; each time it comes due, the updates following it are applied
+        inline, advancing the clock, for as long as nothing else in the queue is due first (ties go to what was
+        queued earlier), so long streams replay in constant memory with little queue overhead.
+
+        Updates sharing a timestamp collapse according to their signal's Conflation policy, if any, as with
+        schedule_update_at(); the collapsed values are delivered once the stream moves on to a later time.
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive: {batch_size}")
+
+        iterator = iter(updates)
+        network = self.network
+        queue = self.queue
+        next_update = next(iterator, None)
+        if next_update is None:
+            return
+        conflated = []
+
+        def apply(signal: MutableSignal, value: Any):
+            conflation = signal.conflation
+            if conflation is None:
+                signal.set_value(value)
+                network.activate(signal)
+            elif conflation.offer(value):
+                conflated.append(signal)
+
+        def drain():
+            nonlocal next_update
+            try:
+                apply(next_update[1], next_update[2])
+                count = 1
+                for next_update in iterator:
+                    timestamp = next_update[0]
+                    if timestamp < self.get_time():
+                        raise ValueError(f"updates out of time order: {timestamp} is before {self.get_time()}")
+                    if timestamp > self.get_time():
+                        # everything due now has been offered; updates still due now in a later entry keep
+                        # collapsing into what is pending
+                        deliver_conflated_signals(network, conflated)
+                    if count == batch_size or (queue and queue[0][0] <= timestamp) or \
+                            (self.until is not None and timestamp > self.until):
+                        self.__enqueue(timestamp, drain)
+                        return
+                    self.clock.advance_to(timestamp)
+                    apply(next_update[1], next_update[2])
+                    count += 1
+            except BaseException:
+                deliver_conflated_signals(network, conflated)
+                raise
+            deliver_conflated_signals(network, conflated)
+
+        if next_update[0] < self.get_time():
+            raise ValueError(f"cannot schedule update at {next_update[0]}, before current time {self.get_time()}")
+        self.__enqueue(next_update[0], drain)
+
+    def schedule_timer(self, delay: timedelta, callback: Callable[[], Any]) -> ScheduledCallback:
+        return self.__enqueue(self.get_time() + delay.total_seconds(), callback, timer=True)
+
+    def run(self, until: float = None):
+        """
+        Runs queued updates and timers in time order, advancing the simulated clock to each one.
+
+        :param until: if given, stop before anything scheduled after this time and leave the clock there;
+            otherwise run until no updates are left to replay: once only periodic timers remain, each fires
+            once more, e.g. so a BufferWithTime flushes what it holds, and then run() returns, as they would
+            otherwise keep rescheduling themselves forever
+        """
+        queue = self.queue
+        self.until = until
+        horizon = None
+        try:
+            while queue:
+                stop_at = until
+                if until is None and not self.data_entries and self.timer_service is not None:
+                    # fixed when the updates run out, as every firing moves the timers' next deadlines on
+                    if horizon is None:
+                        horizon = self.timer_service.periodic_horizon()
+                    stop_at = horizon
+                else:
+                    horizon = None
+                timestamp, _, scheduled = queue[0]
+                if stop_at is not None and timestamp > stop_at:
+                    break
+                heapq.heappop(queue)
+                if not scheduled.timer:
+                    self.data_entries -= 1
+                if not scheduled.cancelled:
+                    self.clock.advance_to(timestamp)
+                    scheduled.callback()
+        finally:
+            self.until = None
+        if until is not None and until > self.get_time():
+            self.clock.advance_to(until)
+
+    def __enqueue(self, timestamp: float, callback: Callable[[], Any], timer: bool = False) -> ScheduledCallback:
+        scheduled = ScheduledCallback(callback, timer)
+        if not timer:
+            self.data_entries += 1
+        self.sequence += 1
+        heapq.heappush(self.queue, (timestamp, self.sequence, scheduled))
+        return scheduled
@@ -6,7 +6,10 @@ from tau.core import Event, Network
 class Lambda(Event):
     """
     A helper implementation of Event that binds any Python function to zero or more Event parameters.
+    The function runs once per tick in which any parameter activates, after all of them have settled.
     """
+    __slots__ = ('parameters', 'function')
+
     def __init__(self, network: Network, parameters: Any, function: Callable[[Any], Any]):
         super().__init__()
         if type(parameters) is not list:
@@ -28,6 +31,8 @@ class Do(Event):
 
     .. seealso:: http://reactivex.io/documentation/operators/do.html
     """
+    __slots__ = ('event', 'function')
+
     def __init__(self, network: Network, event: Event, function: Callable[[], Any]):
         super().__init__()
         self.event = event
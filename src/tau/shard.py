@@ -0,0 +1,235 @@
+import asyncio
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+from typing import Any, Iterable, List, Tuple
+
+from tau.core import Event, MutableSignal, Network, NetworkScheduler, Signal
+
+
+class ShardedNetworkScheduler:
+    """
+    Runs the independent parts of a Network in a pool of worker processes, so a graph made up of many
+    disconnected components (e.g. one per symbol) can use more than one core.
+
+    The network is split into its weakly connected components, or into explicitly given partitions, which
+    are spread across the workers. Each worker is forked from the current process once the graph has been
+    built, so it inherits its own copy of the graph -- no pickling of nodes or their functions is needed --
+    and runs its shards with its own NetworkScheduler. Updates are routed to whichever worker owns the source
+    signal, in batches; whenever one of the given output signals updates in a worker, its value is sent back
+    and applied to a matching MutableSignal in the parent scheduler's network (see get_output()).
+
+    Values must be picklable. Workers are forked, so this requires a platform supporting the 'fork' start
+    method, and timers or tasks created before starting do not carry over into the workers.
+
+    If propagation raises in a worker, the rest of that batch is skipped but the worker carries on with later
+    batches; the first such error is re-raised by close(). A worker process that dies outright is noticed
+    too: close() then raises RuntimeError rather than waiting for it, as does routing further updates to it.
+    """
+
+    # seconds the output reader waits on the outbound queue before checking whether workers are still alive
+    poll_interval = 0.1
+
+    def __init__(self, network: Network, outputs: List[Signal], scheduler: NetworkScheduler,
+                 partitions: List[List[Event]] = None, workers: int = None, batch_size: int = 1000):
+        self.network = network
+        self.scheduler = scheduler
+        self.batch_size = batch_size
+        self.outputs = outputs
+        self.output_mirrors = {output: MutableSignal() for output in outputs}
+        self.context = multiprocessing.get_context('fork')
+
+        if partitions is None:
+            partitions = network.components()
+        worker_count = min(workers if workers is not None else os.cpu_count(), len(partitions))
+
+        # spread partitions across workers, largest first, always onto the least-loaded worker
+        loads = [0] * worker_count
+        self.owners = {}
+        for partition in sorted(partitions, key=len, reverse=True):
+            worker = loads.index(min(loads))
+            loads[worker] += len(partition)
+            for evt in partition:
+                self.owners[evt] = worker
+
+        self.inbound = [self.context.Queue() for _ in range(worker_count)]
+        self.outbound = self.context.Queue()
+        self.pending = [[] for _ in range(worker_count)]
+        self.flush_scheduled = False
+        self.processes = []
+        self.reader = None
+        self.closed = None
+        self.errors = []
+        self.dead_workers = set()
+
+    def get_output(self, signal: Signal) -> MutableSignal:
+        """
+        :return: the signal in the parent scheduler's network that mirrors the given output signal
+        """
+        return self.output_mirrors[signal]
+
+    def start(self):
+        """
+        Forks the worker processes; call from within the parent's running event loop, after the graph is built.
+        """
+        loop = asyncio.get_event_loop()
+        self.closed = loop.create_future()
+        for worker in range(len(self.inbound)):
+            process = self.context.Process(target=self.__run_worker, args=(worker,), daemon=True)
+            process.start()
+            self.processes.append(process)
+        self.reader = threading.Thread(target=self.__read_outputs, args=(loop,), daemon=True)
+        self.reader.start()
+
+    def schedule_update(self, signal: MutableSignal, value: Any):
+        """
+        Queues an update for the worker owning the given source signal. Updates are sent in batches, at the
+        latest at the end of the current event loop iteration.
+        """
+        worker = self.owners.get(signal)
+        if worker is None:
+            raise ValueError(f"{signal} is not part of any shard")
+        if worker in self.dead_workers:
+            raise RuntimeError(f"worker {worker}, which owns {signal}, has died")
+        pending = self.pending[worker]
+        pending.append((self.network.node_id_map[signal], value))
+        if len(pending) >= self.batch_size:
+            self.__flush_worker(worker)
+        elif not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_event_loop().call_soon(self.__flush)
+
+    def schedule_updates(self, updates: Iterable[Tuple[MutableSignal, Any]]):
+        for signal, value in updates:
+            self.schedule_update(signal, value)
+
+    async def close(self):
+        """
+        Sends all pending updates, waits for every worker to finish them and deliver its outputs, then stops
+        the workers.
+
+        :raises: the first error raised by propagation in any worker, or RuntimeError if a worker died
+        """
+        self.__flush()
+        for inbound in self.inbound:
+            inbound.put(None)
+        await self.closed
+        for process in self.processes:
+            process.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def __flush(self):
+        self.flush_scheduled = False
+        for worker in range(len(self.pending)):
+            if self.pending[worker]:
+                self.__flush_worker(worker)
+
+    def __flush_worker(self, worker: int):
+        self.inbound[worker].put(self.pending[worker])
+        self.pending[worker] = []
+
+    def __run_worker(self, worker: int):
+        # runs in the forked child, against its own copy of the network
+        network = self.network
+        inbound = self.inbound[worker]
+        outbound = self.outbound
+        fired = []
+
+        for output_id, output in enumerate(self.outputs):
+            if self.owners.get(output) == worker:
+                network.connect(output, OutputForwarder(output, output_id, fired))
+
+        async def main():
+            loop = asyncio.get_event_loop()
+            scheduler = NetworkScheduler(network)
+            while True:
+                batch = await loop.run_in_executor(None, inbound.get)
+                if batch is None:
+                    break
+                events = network.events
+                try:
+                    await scheduler.schedule_updates(((events[node_id], value) for node_id, value in batch),
+                                                     self.batch_size)
+                except Exception as error:
+                    outbound.put((worker, picklable_error(error)))
+                finally:
+                    if fired:
+                        outbound.put((worker, fired.copy()))
+                        fired.clear()
+
+        try:
+            asyncio.run(main())
+        except BaseException as error:
+            outbound.put((worker, picklable_error(error)))
+            raise
+        finally:
+            # tells the parent this worker is done; the queue's feeder thread is flushed before the process exits
+            outbound.put((worker, None))
+
+    def __read_outputs(self, loop: asyncio.AbstractEventLoop):
+        # runs on a background thread in the parent, handing output batches over to the event loop
+        remaining = set(range(len(self.processes)))
+        dead = set()
+        while remaining:
+            try:
+                worker, message = self.outbound.get(timeout=self.poll_interval)
+            except queue.Empty:
+                # a worker already found dead before this wait has had anything it sent read by now
+                for worker in dead & remaining:
+                    exitcode = self.processes[worker].exitcode
+                    loop.call_soon_threadsafe(self.__fail, worker,
+                                              RuntimeError(f"worker {worker} died with exit code {exitcode}"))
+                remaining -= dead
+                dead = {worker for worker in remaining if not self.processes[worker].is_alive()}
+                continue
+            if message is None:
+                remaining.discard(worker)
+            elif isinstance(message, BaseException):
+                loop.call_soon_threadsafe(self.__fail, None, message)
+            else:
+                loop.call_soon_threadsafe(self.__apply_outputs, message)
+        loop.call_soon_threadsafe(self.closed.set_result, None)
+
+    def __fail(self, worker: int, error: BaseException):
+        if worker is not None:
+            self.dead_workers.add(worker)
+        self.errors.append(error)
+
+    def __apply_outputs(self, batch: List[Tuple[int, Any]]):
+        network = self.scheduler.get_network()
+        mirrors = self.output_mirrors
+        outputs = self.outputs
+        for output_id, value in batch:
+            mirror = mirrors[outputs[output_id]]
+            mirror.set_value(value)
+            network.activate(mirror)
+
+
+def picklable_error(error: BaseException) -> BaseException:
+    """
+    :return: the error if it can be sent back to the parent process, else a RuntimeError describing it
+    """
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(repr(error))
+
+
+class OutputForwarder(Event):
+    """
+    Records the values of a shard's output signal so the worker can send them back to the parent.
+    """
+    __slots__ = ('output', 'output_id', 'fired')
+
+    def __init__(self, output: Signal, output_id: int, fired: List[Tuple[int, Any]]):
+        self.output = output
+        self.output_id = output_id
+        self.fired = fired
+
+    def on_activate(self) -> bool:
+        self.fired.append((self.output_id, self.output.get_value()))
+        return False
@@ -1,32 +1,61 @@
 import asyncio
+import itertools
+import operator
 from abc import abstractmethod
+from concurrent.futures import Executor
+from collections import deque
 from datetime import timedelta
-from typing import Callable, Any, List
+from typing import Callable, Any, List, Iterable, AsyncIterable, Sequence, Union
 
-from tau.core import Signal, Network, MutableSignal, NetworkScheduler, Event
+from tau.core import Signal, Network, MutableSignal, NetworkScheduler, Event, feed_async_iterable
 
 
 class Function(Signal):
     """
     Base class for streaming functions with zero or more streaming input signals.
     """
+    __slots__ = ('parameters', 'batched')
+
     def __init__(self, network: Network, parameters: Any):
         super().__init__()
         if type(parameters) is not list:
             parameters = [parameters]
         self.parameters = parameters
+        # batch mode carries on downstream of a batched input, so every operator on the way must support it
+        self.batched = any(getattr(param, 'batched', False) for param in parameters)
+        if self.batched and type(self)._call_batch is Function._call_batch:
+            raise TypeError(f"{type(self).__name__} does not support batched input")
         for param in parameters:
             network.connect(param, self)
 
     def on_activate(self) -> bool:
         self.modified = False
-        self._call()
+        if self.batched:
+            self._call_batch()
+        else:
+            self._call()
         return self.modified
 
     @abstractmethod
     def _call(self):
         pass
 
+    def _call_batch(self):
+        """
+        Processes a chunk of input values at once, producing the chunk of values that calling _call() once
+        per input value would have produced; only used when batched is set, i.e. when an input is batched.
+        Operators that do not override it reject batched inputs.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support batch mode")
+
+    # single-input operators that can be fused into a FusedChain define _apply(value), which does what _call()
+    # does for one valid input value and returns the new output value, or NO_VALUE if there is none
+    _apply = None
+
+
+# returned by Function#_apply() when an input value produces no output, e.g. one rejected by a Filter
+NO_VALUE = object()
+
 
 class BufferWithCount(Function):
     """
@@ -35,6 +64,9 @@ class BufferWithCount(Function):
 
     .. seealso:: http://reactivex.io/documentation/operators/buffer.html
     """
+    __slots__ = ('values', 'count', 'buffer')
+    state_slots = ('buffer',)
+
     def __init__(self, network: Network, values: Signal, count: int):
         super().__init__(network, [values])
         self.values = values
@@ -54,36 +86,144 @@ class BufferWithTime(Function):
     Operators that transforms a stream of values into batched values, as lists. This particular
     implementation corresponds to rxpy's buffer_with_time operator.
 
+    The buffer is flushed by the scheduler's shared TimerService as soon as each interval expires, whether or
+    not another value has arrived; intervals in which nothing arrived produce no batch. Intervals are aligned
+    to the clock, so e.g. one-minute buffers flush on the minute.
+
     .. seealso:: http://reactivex.io/documentation/operators/buffer.html
     """
-    def __init__(self, network: Network, values: Signal, interval: timedelta):
-        super().__init__(network, [values])
+    __slots__ = ('values', 'interval', 'buffer', 'timed_out', 'timer')
+    state_slots = ('buffer',)
+
+    def __init__(self, scheduler: NetworkScheduler, values: Signal, interval: timedelta):
+        super().__init__(scheduler.get_network(), [values])
         self.values = values
         self.interval = interval
         self.buffer = list()
         self.timed_out = False
 
-        async def expire_timeout():
-            while True:
-                await asyncio.sleep(int(self.interval.total_seconds()))
-                self.timed_out = True
+        def expire_timeout():
+            self.timed_out = True
+            scheduler.get_network().activate(self)
 
-        asyncio.create_task(expire_timeout())
+        self.timer = scheduler.get_timer_service().schedule_periodic(interval, expire_timeout)
+
+    def on_remove(self):
+        self.timer.cancel()
 
     def _call(self):
-        if self.values.is_valid():
-            self.buffer.append(self.values.get_value())
-            if self.timed_out:
+        if self.timed_out:
+            self.timed_out = False
+            if self.buffer:
                 self._update(self.buffer.copy())
                 self.buffer.clear()
-                self.timed_out = False
+        elif self.values.is_valid():
+            self.buffer.append(self.values.get_value())
+
+
+class WindowWithTime(Function):
+    """
+    Operator that accumulates values using a rolling window of time. Every tick results in a new list of the
+    values that arrived within the last window of time, oldest first; as values age out of the window the
+    shrunken list is emitted too, on a timer, even if nothing new arrives.
+
+    .. seealso:: http://reactivex.io/documentation/operators/window.html
+    """
+    __slots__ = ('scheduler', 'values', 'window', 'buffer', 'timed_out', 'timer')
+    state_slots = ('buffer',)
+
+    def __init__(self, scheduler: NetworkScheduler, values: Signal, window: timedelta):
+        super().__init__(scheduler.get_network(), [values])
+        self.scheduler = scheduler
+        self.values = values
+        self.window = window.total_seconds()
+        self.buffer = deque()
+        self.timed_out = False
+        self.timer = None
+
+    def _call(self):
+        buffer = self.buffer
+        cutoff = self.scheduler.get_time() - self.window
+        if self.timed_out:
+            self.timed_out = False
+            self.timer = None
+            expired = False
+            while buffer and buffer[0][0] <= cutoff:
+                buffer.popleft()
+                expired = True
+            if expired:
+                self._update([value for _, value in buffer])
+        elif self.values.is_valid():
+            buffer.append((self.scheduler.get_time(), self.values.get_value()))
+            while buffer and buffer[0][0] <= cutoff:
+                buffer.popleft()
+            self._update([value for _, value in buffer])
+        self.__schedule_expiry()
+
+    def set_state(self, state: tuple):
+        super().set_state(state)
+        self.__schedule_expiry()
+
+    def on_remove(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def __schedule_expiry(self):
+        if self.buffer and self.timer is None:
+            delay = self.buffer[0][0] + self.window - self.scheduler.get_time()
+            self.timer = self.scheduler.get_timer_service().schedule(timedelta(seconds=delay), self.__expire)
+
+    def __expire(self):
+        self.timed_out = True
+        self.scheduler.get_network().activate(self)
+
+
+class SampleWithTime(Function):
+    """
+    Operator that emits the most recent value of a stream once per interval, on a timer, provided the stream
+    has updated since the previous sample. Intervals are aligned to the clock.
+
+    .. seealso:: http://reactivex.io/documentation/operators/sample.html
+    """
+    __slots__ = ('values', 'updated', 'timed_out', 'timer')
+    state_slots = ('updated',)
+
+    def __init__(self, scheduler: NetworkScheduler, values: Signal, interval: timedelta):
+        super().__init__(scheduler.get_network(), [values])
+        self.values = values
+        self.updated = False
+        self.timed_out = False
+
+        def expire_timeout():
+            self.timed_out = True
+            scheduler.get_network().activate(self)
+
+        self.timer = scheduler.get_timer_service().schedule_periodic(interval, expire_timeout)
+
+    def on_remove(self):
+        self.timer.cancel()
+
+    def _call(self):
+        if self.timed_out:
+            self.timed_out = False
+            if self.updated:
+                self.updated = False
+                self._update(self.values.get_value())
+        elif self.values.is_valid():
+            self.updated = True
 
 
 class Filter(Function):
     """
     Simple operator function that applies a filtering predicate to a stream of values
     and only returns matching values.
+
+    In batch mode the predicate is applied to each whole chunk and must return a boolean mask, so it must be
+    vectorized (e.g. built from NumPy comparisons).
     """
+    __slots__ = ('values', 'predicate')
+
     def __init__(self, network: Network, values: Signal, predicate: Callable[[Any], bool]):
         super().__init__(network, [values])
         self.values = values
@@ -95,13 +235,28 @@ class Filter(Function):
             if self.predicate(next_value):
                 self._update(next_value)
 
+    def _apply(self, value: Any) -> Any:
+        return value if self.predicate(value) else NO_VALUE
+
+    def _call_batch(self):
+        if self.values.is_valid():
+            next_values = self.values.get_value()
+            matches = next_values[self.predicate(next_values)]
+            if len(matches) > 0:
+                self._update(matches)
+
 
 class Map(Function):
     """
     Transforming function that applies a Callable to incoming values and updates the output value.
 
+    In batch mode the mapper is applied to each whole chunk, so it must be vectorized (e.g. built from
+    NumPy ufuncs).
+
     .. seealso:: http://reactivex.io/documentation/operators/map.html
     """
+    __slots__ = ('values', 'mapper')
+
     def __init__(self, network: Network, values: Signal, mapper: Callable[[Any], Any]):
         super().__init__(network, [values])
         self.values = values
@@ -112,39 +267,304 @@ class Map(Function):
             next_value = self.values.get_value()
             self._update(self.mapper(next_value))
 
+    def _apply(self, value: Any) -> Any:
+        return self.mapper(value)
+
+    def _call_batch(self):
+        if self.values.is_valid() and len(self.values.get_value()) > 0:
+            self._update(self.mapper(self.values.get_value()))
+
+
+class LazyMap(Map):
+    """
+    A Map evaluated on demand: activation only marks the node dirty and passes the activation on, and the
+    mapper runs when get_value() or is_valid() is next called, on the then-current input value. The result is
+    memoized until the input changes again, so an expensive mapper runs at the rate its consumers poll it
+    rather than at the rate of the feed; intermediate input values nobody looked at are skipped.
+
+    Eager downstream operators read the value on every tick, so the saving comes from consumers that only look
+    occasionally, e.g. a Lambda that polls on a timer or other lazy nodes. The mapper must be a pure function
+    of its input.
+    """
+    __slots__ = ('dirty', 'evaluations')
+
+    # fusing would evaluate the mapper eagerly
+    _apply = None
+
+    def __init__(self, network: Network, values: Signal, mapper: Callable[[Any], Any]):
+        super().__init__(network, values, mapper)
+        self.dirty = False
+        self.evaluations = 0
+
+    def on_activate(self) -> bool:
+        # validity of the input is only checked on evaluation, so lazy inputs are not evaluated here either
+        self.dirty = True
+        return True
+
+    def is_valid(self) -> bool:
+        return self.get_value() is not None
+
+    def get_value(self) -> Any:
+        if self.dirty:
+            self.dirty = False
+            self.evaluations += 1
+            if self.batched:
+                self._call_batch()
+            else:
+                self._call()
+        return self.value
+
+    def get_state(self) -> tuple:
+        self.get_value()
+        return super().get_state()
+
 
 class FlatMap(MutableSignal):
     """
     Transforming function that applies a Callable to incoming values and updates the output value.
 
+    The values of every incoming list go into a single FIFO queue, drained batch_size at a time through
+    NetworkScheduler#schedule_updates(), so they come out in input order even when lists arrive faster than
+    they drain. With a NetworkScheduler, await join() to wait until every value has come out.
+
     .. seealso:: http://reactivex.io/documentation/operators/flatmap.html
     """
-    def __init__(self, scheduler: NetworkScheduler, values: Signal):
+    __slots__ = ('scheduler', 'values', 'batch_size', 'pending', 'draining', 'task')
+
+    def __init__(self, scheduler: NetworkScheduler, values: Signal, batch_size: int = 1000):
         super().__init__()
         self.scheduler = scheduler
         self.values = values
+        self.batch_size = batch_size
+        self.pending = deque()
+        self.draining = False
+        self.task = None
 
         class Handler(Event):
+            __slots__ = ('outer',)
+
             def __init__(self, outer):
                 self.outer = outer
 
             def on_activate(self) -> bool:
                 if values.is_valid():
-                    next_values = values.get_value()
-                    for next_value in next_values:
-                        scheduler.schedule_update(self.outer, next_value)
+                    self.outer.extend(values.get_value())
                     return True
                 else:
                     return False
 
         scheduler.get_network().connect(values, Handler(self))
 
+    def extend(self, next_values: Iterable):
+        """
+        Queues values to emit, after any still waiting.
+        """
+        self.pending.extend(next_values)
+        if not self.draining and self.pending:
+            self.draining = True
+            self.task = self.scheduler.schedule_updates(self.__drain(), self.batch_size)
+
+    async def join(self):
+        """
+        Waits until every value queued so far has been emitted.
+        """
+        while self.draining and self.task is not None:
+            await asyncio.shield(self.task)
+
+    def __drain(self):
+        pending = self.pending
+        try:
+            while pending:
+                yield self, pending.popleft()
+        finally:
+            self.draining = False
+
+
+class AsyncMap(MutableSignal):
+    """
+    Transforming function that applies a Callable to incoming values off the event loop thread, so a slow
+    mapper (decoding large payloads, a pricing model, ...) does not stall the rest of the network. Plain
+    functions run on the given concurrent.futures executor -- the loop's default thread pool if none, or e.g. a
+    ProcessPoolExecutor for CPU-bound work, in which case the mapper and values must be picklable -- and
+    coroutine functions are awaited as tasks. At most max_in_flight values are mapped at once; the rest wait
+    in arrival order. Results are fed back in through NetworkScheduler#schedule_update(), either in input
+    order (ordered=True) or as soon as each one completes.
+
+    A mapper that raises is reported to the event loop's exception handler and its value skipped. Needs a
+    running event loop, so cannot be used with HistoricalNetworkScheduler.
+    """
+    __slots__ = ('scheduler', 'mapper', 'executor', 'max_in_flight', 'ordered', 'waiting', 'in_flight',
+                 'next_sequence', 'emit_sequence', 'results', 'idle', 'errors')
+
+    def __init__(self, scheduler: NetworkScheduler, values: Signal, mapper: Callable[[Any], Any],
+                 executor: Executor = None, max_in_flight: int = 16, ordered: bool = True):
+        super().__init__()
+        if max_in_flight < 1:
+            raise ValueError(f"max_in_flight must be positive: {max_in_flight}")
+        self.scheduler = scheduler
+        self.mapper = mapper
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.ordered = ordered
+        self.waiting = deque()
+        self.in_flight = 0
+        self.next_sequence = 0
+        self.emit_sequence = 0
+        self.results = {}
+        self.idle = None
+        self.errors = 0
+
+        class Handler(Event):
+            __slots__ = ('outer',)
+
+            def __init__(self, outer):
+                self.outer = outer
+
+            def on_activate(self) -> bool:
+                if values.is_valid():
+                    self.outer.submit(values.get_value())
+                    return True
+                else:
+                    return False
+
+        scheduler.get_network().connect(values, Handler(self))
+
+    def submit(self, value: Any):
+        """
+        Maps a value as if the input signal had updated with it.
+        """
+        sequence = self.next_sequence
+        self.next_sequence += 1
+        if self.in_flight < self.max_in_flight:
+            self.__start(sequence, value)
+        else:
+            self.waiting.append((sequence, value))
+
+    async def join(self):
+        """
+        Waits until every value received so far has been mapped and its result scheduled.
+        """
+        if self.in_flight or self.waiting:
+            if self.idle is None:
+                self.idle = asyncio.get_event_loop().create_future()
+            await asyncio.shield(self.idle)
+
+    def __start(self, sequence: int, value: Any):
+        self.in_flight += 1
+        if asyncio.iscoroutinefunction(self.mapper):
+            future = self.scheduler.spawn(self.mapper(value))
+        else:
+            future = asyncio.get_event_loop().run_in_executor(self.executor, self.mapper, value)
+        future.add_done_callback(lambda f: self.__complete(sequence, f))
+
+    def __complete(self, sequence: int, future: asyncio.Future):
+        self.in_flight -= 1
+        if future.cancelled():
+            result = NO_VALUE
+        elif future.exception() is not None:
+            self.errors += 1
+            result = NO_VALUE
+            asyncio.get_event_loop().call_exception_handler({
+                'message': f'{type(self).__name__} mapper failed',
+                'exception': future.exception(),
+                'future': future,
+            })
+        else:
+            result = future.result()
+
+        if self.ordered:
+            self.results[sequence] = result
+            while self.emit_sequence in self.results:
+                next_result = self.results.pop(self.emit_sequence)
+                self.emit_sequence += 1
+                if next_result is not NO_VALUE:
+                    self.scheduler.schedule_update(self, next_result)
+        elif result is not NO_VALUE:
+            self.scheduler.schedule_update(self, result)
+
+        while self.waiting and self.in_flight < self.max_in_flight:
+            self.__start(*self.waiting.popleft())
+        if not self.in_flight and not self.waiting and self.idle is not None:
+            # let the scheduled results go out before waking join()
+            asyncio.get_event_loop().call_soon(self.idle.set_result, None)
+            self.idle = None
+
+
+class GroupBy(Function):
+    """
+    Base class for keyed operators over a multiplexed stream, e.g. one feed carrying trades for thousands of
+    symbols. Each value is routed by a key function to that key's entry in a table of per-key state, so a tick
+    does O(1) work however many keys there are, rather than one Filter evaluation per key. Every update emits
+    a (key, result) pair for the key just updated, and get() looks up the latest result for any key.
+
+    :param key: extracts the key from each incoming value
+    :param selector: extracts the value to aggregate from each incoming value; the whole value by default
+    """
+    __slots__ = ('values', 'key', 'selector', 'states')
+    state_slots = ('states',)
+
+    def __init__(self, network: Network, values: Signal, key: Callable[[Any], Any],
+                 selector: Callable[[Any], Any] = None):
+        super().__init__(network, [values])
+        self.values = values
+        self.key = key
+        self.selector = selector
+        self.states = {}
+
+    def _call(self):
+        if self.values.is_valid():
+            item = self.values.get_value()
+            key = self.key(item)
+            state = self._step(self.states.get(key), item if self.selector is None else self.selector(item))
+            self.states[key] = state
+            self._update((key, self._result(state)))
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """
+        :return: the latest result for the given key, or default if no value has been seen for it
+        """
+        state = self.states.get(key)
+        return default if state is None else self._result(state)
+
+    def keys(self):
+        return self.states.keys()
+
+    @abstractmethod
+    def _step(self, state: Any, value: Any) -> Any:
+        """
+        Folds a value into a key's state, which is None for the first value seen for the key, and returns the
+        new state; must not return None.
+        """
+        pass
+
+    def _result(self, state: Any) -> Any:
+        return state
+
+
+class KeyedScan(GroupBy):
+    """
+    Operator that accumulates values separately per key, like a Scan for each key.
+    """
+    __slots__ = ('accumulator', 'initial_value')
+
+    def __init__(self, network: Network, values: Signal, key: Callable[[Any], Any],
+                 accumulator: Callable[[Any, Any], Any] = operator.add, initial_value: Any = 0.0,
+                 selector: Callable[[Any], Any] = None):
+        super().__init__(network, values, key, selector)
+        self.accumulator = accumulator
+        self.initial_value = initial_value
+
+    def _step(self, state: Any, value: Any) -> Any:
+        return self.accumulator(self.initial_value if state is None else state, value)
+
 
 class Just(MutableSignal):
     """
     Emits a single value immediately.
     .. seealso:: http://reactivex.io/documentation/operators/just.html
     """
+    __slots__ = ()
+
     def __init__(self, scheduler: NetworkScheduler, value: Any):
         super().__init__()
         scheduler.schedule_update(self, value)
@@ -152,14 +572,183 @@ class Just(MutableSignal):
 
 class From(MutableSignal):
     """
-    Emits a list of values immediately, in order.
+    Emits a list of values immediately, in order. Values may also come from a generator or async iterator
+    (consumed as by FromAsyncIterable), in which case they are pulled lazily and fed to the network batch_size
+    at a time by a task, which must be awaited, through the task attribute, for the last of them to be
+    emitted: asyncio.run() cancels tasks still running when it returns. Lists and other sequences need no
+    waiting for; they are read a batch at a time rather than copied, so leave them unchanged until emitted.
 
     .. seealso:: http://reactivex.io/documentation/operators/from.html
     """
-    def __init__(self, scheduler: NetworkScheduler, values: List):
+    __slots__ = ('task',)
+
+    def __init__(self, scheduler: NetworkScheduler, values: Union[Iterable, AsyncIterable], batch_size: int = 1000):
+        super().__init__()
+        if hasattr(values, '__aiter__'):
+            self.task = scheduler.spawn(feed_async_iterable(scheduler.get_network(), self, values, batch_size))
+        elif isinstance(values, Sequence):
+            self.task = scheduler.schedule_updates(SignalUpdates(self, values), batch_size)
+        else:
+            self.task = scheduler.schedule_updates(((self, value) for value in values), batch_size)
+
+
+class FromAsyncIterable(MutableSignal):
+    """
+    Emits every value from an async iterable -- a websocket, an async file reader, an async generator -- or
+    an asyncio.Queue, activating the network inline as each value arrives rather than scheduling a callback
+    per value. Control only returns to the event loop while waiting on the source and after every batch_size
+    values.
+
+    The source is closed when it runs out, when cancel() is called or when propagation raises; completed is
+    then set, and the task attribute completes (or re-raises the error).
+    """
+    __slots__ = ('task', 'completed')
+
+    def __init__(self, scheduler: NetworkScheduler, values: Union[AsyncIterable, asyncio.Queue],
+                 batch_size: int = 100):
         super().__init__()
-        for value in values:
-            scheduler.schedule_update(self, value)
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive: {batch_size}")
+        self.completed = False
+
+        async def drain():
+            try:
+                await feed_async_iterable(scheduler.get_network(), self, values, batch_size)
+            finally:
+                self.completed = True
+
+        self.task = scheduler.spawn(drain())
+
+    def cancel(self):
+        """
+        Stops consuming the source and closes it.
+        """
+        self.task.cancel()
+
+
+class SignalUpdates(Sequence):
+    """
+    A read-only view of a sequence of values as (signal, value) update pairs, so a list can be handed to
+    schedule_updates() without building a second list of pairs alongside it: pairs are only made for each
+    slice as it is taken.
+    """
+    __slots__ = ('signal', 'values')
+
+    def __init__(self, signal: MutableSignal, values: Sequence):
+        self.signal = signal
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index):
+        signal = self.signal
+        if isinstance(index, slice):
+            return [(signal, value) for value in self.values[index]]
+        return signal, self.values[index]
+
+    def __iter__(self):
+        signal = self.signal
+        return ((signal, value) for value in self.values)
+
+
+class FromArray(MutableSignal):
+    """
+    Emits the contents of a NumPy array as a batched signal, chunk_size values per activation. Chunks are
+    zero-copy views onto the array.
+    """
+    __slots__ = ('task',)
+
+    batched = True
+
+    def __init__(self, scheduler: NetworkScheduler, values: Any, chunk_size: int = 4096, batch_size: int = 1):
+        super().__init__()
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive: {chunk_size}")
+        chunks = ((self, values[i:i + chunk_size]) for i in range(0, len(values), chunk_size))
+        self.task = scheduler.schedule_updates(chunks, batch_size)
+
+
+class FromTickFile(MutableSignal):
+    """
+    Replays ticks from a memory-mapped columnar file: a NumPy .npy structured array or, if pyarrow is
+    installed, an Arrow IPC (Feather v2) file. The file is read lazily, chunk_size rows at a time, as
+    zero-copy views onto the mapping, and each row is scheduled at its timestamp via
+    NetworkScheduler#schedule_updates_at(), so even multi-GB files replay in constant memory. Rows must be
+    sorted by timestamp.
+
+    Each update is the value_field column of a row, or if that is not given the whole row: a NumPy record,
+    or a dict for Arrow files. With batched=True the signal instead emits each chunk -- the value_field
+    column, the structured array slice or the Arrow RecordBatch -- at the timestamp of its last row.
+
+    :param timestamp_scale: multiplier converting numeric timestamps to seconds, e.g. 1e-9 for nanoseconds;
+        datetime64 columns are converted automatically
+    """
+    __slots__ = ('task', 'batched')
+
+    def __init__(self, scheduler: NetworkScheduler, path: str, timestamp_field: str = 'timestamp',
+                 value_field: str = None, timestamp_scale: float = 1.0, chunk_size: int = 4096,
+                 batched: bool = False):
+        super().__init__()
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be positive: {chunk_size}")
+        self.batched = batched
+
+        def updates():
+            last_timestamp = float('-inf')
+            for chunk, get_column in read_columnar_chunks(path, chunk_size):
+                timestamps = timestamps_to_seconds(get_column(timestamp_field), timestamp_scale)
+                if len(timestamps) == 0:
+                    continue
+                if timestamps[0] < last_timestamp or (timestamps[1:] < timestamps[:-1]).any():
+                    raise ValueError(f"{path} is not sorted by {timestamp_field}")
+                last_timestamp = timestamps[-1]
+
+                if batched:
+                    yield float(last_timestamp), self, get_column(value_field) if value_field is not None else chunk
+                else:
+                    if value_field is not None:
+                        rows = get_column(value_field).tolist()
+                    elif hasattr(chunk, 'dtype'):
+                        rows = chunk
+                    else:
+                        rows = chunk.to_pylist()
+                    yield from zip(timestamps.tolist(), itertools.repeat(self), rows)
+
+        self.task = scheduler.schedule_updates_at(updates())
+
+
+def read_columnar_chunks(path: str, chunk_size: int):
+    """
+    Lazily reads a memory-mapped .npy structured array or Arrow IPC file in chunks of up to chunk_size rows.
+
+    :return: a generator of (chunk, get_column) pairs, where chunk is a structured array view or Arrow
+        RecordBatch and get_column(name) returns that column of the chunk as a NumPy array
+    """
+    if path.endswith('.npy'):
+        import numpy as np
+        array = np.load(path, mmap_mode='r')
+        for start in range(0, len(array), chunk_size):
+            chunk = array[start:start + chunk_size]
+            yield chunk, chunk.__getitem__
+    else:
+        import pyarrow as pa
+        reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for start in range(0, batch.num_rows, chunk_size):
+                chunk = batch.slice(start, chunk_size)
+                yield chunk, lambda name, c=chunk: c.column(name).to_numpy(zero_copy_only=False)
+
+
+def timestamps_to_seconds(timestamps: Any, scale: float):
+    import numpy as np
+    if timestamps.dtype.kind == 'M':
+        return timestamps.astype('datetime64[ns]').astype(np.int64) * 1e-9
+    elif scale != 1.0:
+        return timestamps * scale
+    else:
+        return np.asarray(timestamps, dtype=float)
 
 
 class Interval(MutableSignal):
@@ -168,21 +757,92 @@ class Interval(MutableSignal):
 
     .. seealso:: http://reactivex.io/documentation/operators/interval.html
     """
+    __slots__ = ('next_value', 'timer')
+    state_slots = ('next_value',)
 
     def on_activate(self) -> bool:
         return True
 
     def __init__(self, scheduler: NetworkScheduler, interval: timedelta = timedelta(seconds=1)):
         super().__init__()
-        self.next_value = 0
+        self.next_value = 1
+        scheduler.schedule_update(self, self.next_value)
+
+        def update():
+            self.next_value += 1
+            self.set_value(self.next_value)
+            scheduler.get_network().activate(self)
 
-        async def schedule_update():
-            while True:
-                self.next_value += 1
-                scheduler.schedule_update(self, self.next_value)
-                await asyncio.sleep(int(interval.total_seconds()))
+        self.timer = scheduler.get_timer_service().schedule_periodic(interval, update, align=False)
 
-        asyncio.create_task(schedule_update())
+    def on_remove(self):
+        self.timer.cancel()
+
+
+class RingBuffer:
+    """
+    Fixed-capacity FIFO buffer with O(1) append and eviction of the oldest value once full.
+    """
+    __slots__ = ('values',)
+
+    def __init__(self, capacity: int):
+        self.values = deque(maxlen=capacity)
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, value: Any):
+        self.values.append(value)
+
+    def view(self) -> deque:
+        """
+        :return: the live contents, oldest first; the object is reused and mutated as values arrive
+        """
+        return self.values
+
+    def snapshot(self) -> List:
+        return list(self.values)
+
+
+class ArrayRingBuffer(RingBuffer):
+    """
+    RingBuffer specialized for numeric values, backed by a preallocated NumPy array. Each value is written
+    twice, capacity slots apart, so the current window is always a contiguous slice and can be read as a
+    zero-copy array view. Requires numpy.
+    """
+    __slots__ = ('capacity', 'array', 'start', 'size')
+
+    # noinspection PyMissingConstructor
+    def __init__(self, capacity: int, dtype: Any = float):
+        import numpy as np
+        self.capacity = capacity
+        self.array = np.zeros(2 * capacity, dtype=dtype)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, value: Any):
+        if self.size < self.capacity:
+            end = self.size
+            self.size += 1
+        else:
+            end = self.start
+            self.start = self.start + 1 if self.start + 1 < self.capacity else 0
+        self.array[end] = value
+        self.array[end + self.capacity] = value
+
+    def view(self):
+        """
+        :return: a read-only array view of the current contents, oldest first; only valid until the next append
+        """
+        window = self.array[self.start:self.start + self.size]
+        window.flags.writeable = False
+        return window
+
+    def snapshot(self):
+        return self.array[self.start:self.start + self.size].copy()
 
 
 class WindowWithCount(Function):
@@ -190,25 +850,28 @@ class WindowWithCount(Function):
     Operator that accumulates values using a rolling window. Every tick results
     in a new batch with one more value at the end and one less value at the front.
 
+    By default each batch is a fresh copy of the whole window, safe to keep, so every tick costs O(count) time
+    and memory. Only with live_view=True is a tick O(1): the operator then emits its ring buffer's live
+    contents instead, which must not be modified and are only valid until the next tick, so copy them if they
+    must be kept. Passing a NumPy dtype stores numeric values in an ArrayRingBuffer, so batches are NumPy
+    arrays, and live views are read-only array views.
+
     .. seealso:: http://reactivex.io/documentation/operators/window.html
     """
+    __slots__ = ('buffer', 'count', 'live_view')
+    state_slots = ('buffer',)
 
-    def __init__(self, network: Network, values: Signal, count: int):
+    def __init__(self, network: Network, values: Signal, count: int, live_view: bool = False, dtype: Any = None):
         super().__init__(network, [values])
-        self.buffer = list()
+        self.buffer = RingBuffer(count) if dtype is None else ArrayRingBuffer(count, dtype)
         self.count = count
+        self.live_view = live_view
 
     def _call(self):
         if self.parameters[0].is_valid():
-            if len(self.buffer) == self.count - 1:
-                self.buffer.append(self.parameters[0].get_value())
-                self._update(self.buffer)
-            elif len(self.buffer) == self.count:
-                self.buffer = self.buffer[1:]
-                self.buffer.append(self.parameters[0].get_value())
-                self._update(self.buffer)
-            else:
-                self.buffer.append(self.parameters[0].get_value())
+            self.buffer.append(self.parameters[0].get_value())
+            if len(self.buffer) == self.count:
+                self._update(self.buffer.view() if self.live_view else self.buffer.snapshot())
 
 
 class Scan(Function):
@@ -217,6 +880,9 @@ class Scan(Function):
 
     .. seealso:: http://reactivex.io/documentation/operators/scan.html
     """
+    __slots__ = ('prev_value',)
+    state_slots = ('prev_value',)
+
     def __init__(self, network: Network, values: Signal):
         super().__init__(network, [values])
         self.prev_value = 0.0
@@ -228,45 +894,297 @@ class Scan(Function):
             self._update(new_value)
             self.prev_value = new_value
 
+    def _apply(self, value: Any) -> Any:
+        self.prev_value = self.prev_value + value
+        return self.prev_value
 
-class AllActivated(Event):
+    def _call_batch(self):
+        if self.parameters[0].is_valid() and len(self.parameters[0].get_value()) > 0:
+            new_values = cumulative_sum(self.prev_value, self.parameters[0].get_value())
+            self._update(new_values)
+            self.prev_value = new_values[-1]
+
+
+def cumulative_sum(initial_value: Any, values: Any):
     """
-    An event that activates when all of N input events have activated.
+    Running sums of a chunk of values starting from initial_value, added strictly left to right so each
+    result is bit-for-bit what repeated scalar addition would give.
     """
-    def __init__(self, network: Network, events: List):
+    import numpy as np
+    return np.cumsum(np.concatenate(([initial_value], values)))[1:]
+
+
+class JoinPort(Event):
+    """
+    Relays activations of one input of a join operator, recording which input fired, so the join finds out
+    which of its inputs fired in a tick without checking them all.
+    """
+    __slots__ = ('join', 'index')
+
+    def __init__(self, join: 'Join', index: int):
+        self.join = join
+        self.index = index
+
+    def on_activate(self) -> bool:
+        self.join.fired.append(self.index)
+        return True
+
+
+class Join(Signal):
+    """
+    Base class for operators joining several inputs. Each input is connected through its own JoinPort, so every
+    tick the join is told exactly which inputs fired and does work proportional to those rather than to the
+    number of inputs.
+    """
+    __slots__ = ('inputs', 'fired')
+
+    def __init__(self, network: Network, inputs: List[Event]):
         super().__init__()
-        self.network = network
-        self.events = events
-        self.activated = dict()
-        for event in events:
-            self.activated[event] = False
-            network.connect(event, self)
+        self.inputs = inputs
+        self.fired = []
+        for index, event in enumerate(inputs):
+            port = JoinPort(self, index)
+            network.connect(event, port)
+            network.connect(port, self)
 
     def on_activate(self) -> bool:
-        for event in self.events:
-            if self.network.has_activated(event):
-                self.activated[event] = True
-        return all(self.activated.values())
+        self.modified = False
+        self._join(self.fired)
+        self.fired.clear()
+        return self.modified
+
+    @abstractmethod
+    def _join(self, fired: List[int]):
+        """
+        Handles a tick in which the inputs at the given indices fired, in the order they fired.
+        """
+        pass
 
 
-class AnyActivated(Event):
+class CombineLatest(Join):
     """
-    An event that activates when any of N input events activate.
+    Operator that emits a tuple of the latest value of every input whenever any of them updates, once every
+    input has a value.
+
+    .. seealso:: http://reactivex.io/documentation/operators/combinelatest.html
+    """
+    __slots__ = ('latest', 'missing')
+    state_slots = ('latest', 'missing')
+
+    def __init__(self, network: Network, inputs: List[Signal]):
+        super().__init__(network, inputs)
+        self.latest = [None] * len(inputs)
+        # bit i is set while input i has not produced a valid value yet
+        self.missing = (1 << len(inputs)) - 1
+
+    def _join(self, fired: List[int]):
+        inputs = self.inputs
+        latest = self.latest
+        for index in fired:
+            if inputs[index].is_valid():
+                latest[index] = inputs[index].get_value()
+                self.missing &= ~(1 << index)
+        if not self.missing:
+            self._update(tuple(latest))
+
+
+class WithLatestFrom(Join):
+    """
+    Operator that emits a tuple of the source's value followed by the latest value of each of the other
+    inputs whenever the source updates, once every other input has a value. Updates of the other inputs alone
+    do not emit.
+
+    .. seealso:: http://reactivex.io/documentation/operators/combinelatest.html
+    """
+    __slots__ = ('latest', 'missing')
+    state_slots = ('latest', 'missing')
+
+    def __init__(self, network: Network, source: Signal, others: List[Signal]):
+        super().__init__(network, [source] + list(others))
+        self.latest = [None] * len(self.inputs)
+        self.missing = (1 << len(self.inputs)) - 1
+
+    def _join(self, fired: List[int]):
+        inputs = self.inputs
+        latest = self.latest
+        source_fired = False
+        for index in fired:
+            if inputs[index].is_valid():
+                latest[index] = inputs[index].get_value()
+                self.missing &= ~(1 << index)
+                source_fired = source_fired or index == 0
+        if source_fired and not self.missing:
+            self._update(tuple(latest))
+
+
+class Zip(Join):
+    """
+    Operator that pairs up the values of its inputs in order, emitting a tuple of each input's n-th value once
+    every input has produced it. Values wait in a queue per input holding at most max_pending values; if one
+    input runs ahead of the others by more than that, its oldest waiting values are dropped.
+
+    .. seealso:: http://reactivex.io/documentation/operators/zip.html
     """
+    __slots__ = ('queues', 'empty')
+    state_slots = ('queues', 'empty')
+
+    def __init__(self, network: Network, inputs: List[Signal], max_pending: int = 1000):
+        super().__init__(network, inputs)
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be positive: {max_pending}")
+        self.queues = [deque(maxlen=max_pending) for _ in inputs]
+        # number of inputs with no value waiting
+        self.empty = len(inputs)
+
+    def _join(self, fired: List[int]):
+        inputs = self.inputs
+        queues = self.queues
+        for index in fired:
+            if inputs[index].is_valid():
+                queue = queues[index]
+                if not queue:
+                    self.empty -= 1
+                queue.append(inputs[index].get_value())
+        if not self.empty:
+            values = []
+            for queue in queues:
+                values.append(queue.popleft())
+                if not queue:
+                    self.empty += 1
+            self._update(tuple(values))
+
+
+class AllActivated(Join):
+    """
+    An event that activates when all of N input events have activated, then starts waiting for all of them
+    again.
+    """
+    __slots__ = ('remaining',)
+    state_slots = ('remaining',)
+
     def __init__(self, network: Network, events: List):
-        super().__init__()
-        self.network = network
-        self.events = events
-        self.activated = dict()
-        for event in events:
-            self.activated[event] = False
-            network.connect(event, self)
+        super().__init__(network, events)
+        self.remaining = (1 << len(events)) - 1
+
+    @property
+    def events(self) -> List:
+        return self.inputs
 
+    def _join(self, fired: List[int]):
+        for index in fired:
+            self.remaining &= ~(1 << index)
+        if not self.remaining:
+            self.remaining = (1 << len(self.inputs)) - 1
+            self._update(True)
+
+
+class AnyActivated(Join):
+    """
+    An event that activates when any of N input events activate.
     """
-    An event that activates when all of N input events have activated.
+    __slots__ = ()
+
+    @property
+    def events(self) -> List:
+        return self.inputs
+
+    def _join(self, fired: List[int]):
+        self._update(True)
+
+
+class FusedChain(Event):
     """
+    Runs a linear chain of single-input operators, each feeding only the next, as a single node in place of
+    one node per operator; see fuse_chains(). Each operator's _apply() is called in turn in a tight loop and
+    its output stored as its value, so every operator in the chain still holds the value it would have had
+    unfused, and downstream nodes keep reading the last operator as before.
+    """
+    __slots__ = ('source', 'stages')
+
+    def __init__(self, source: Signal, stages: List[Function]):
+        self.source = source
+        self.stages = stages
+
     def on_activate(self) -> bool:
-        for event in self.events:
-            if self.network.has_activated(event):
-                self.activated[event] = True
-        return any(self.activated.values())
+        if not self.source.is_valid():
+            return False
+        value = self.source.get_value()
+        for stage in self.stages:
+            if value is None:
+                return False
+            value = stage._apply(value)
+            if value is NO_VALUE:
+                return False
+            stage.value = value
+        return True
+
+    def get_state(self) -> tuple:
+        return tuple(stage.get_state() for stage in self.stages)
+
+    def set_state(self, state: tuple):
+        for stage, stage_state in zip(self.stages, state):
+            stage.set_state(stage_state)
+
+
+def fuse_chains(network: Network, min_length: int = 2) -> List[FusedChain]:
+    """
+    Optimization pass replacing every linear chain of fusable operators (those defining _apply(), e.g. Map,
+    Filter and Scan, and not in batch mode) in which each operator is the only consumer of the one before it
+    with a single FusedChain node, which saves the per-node propagation overhead of all but one of them.
+    Operators outside a chain, and the inputs and consumers of a chain, are unaffected, and fused operators
+    keep their values up to date; has_activated() no longer reports on them, though.
+
+    Call once the graph is built, between ticks. Graphs checkpointed after fusing can only be restored into
+    graphs fused the same way.
+
+    :return: the FusedChain nodes added
+    """
+    events = network.events
+    successors = network.successors
+    predecessors = network.predecessors
+    node_id_map = network.node_id_map
+
+    def fusable(node_id: int) -> bool:
+        evt = events[node_id]
+        return isinstance(evt, Function) and evt._apply is not None and not evt.batched and \
+            len(evt.parameters) == 1 and list(predecessors[node_id]) == [node_id_map.get(evt.parameters[0])]
+
+    def follower(node_id: int):
+        # the fusable operator that is the only consumer of node_id and whose only input is node_id, if any
+        if len(successors[node_id]) == 1:
+            successor_id = next(iter(successors[node_id]))
+            if successor_id != node_id and fusable(successor_id):
+                return successor_id
+        return None
+
+    chains = []
+    for node_id in range(len(events)):
+        if events[node_id] is None or not fusable(node_id):
+            continue
+        predecessor_id = next(iter(predecessors[node_id]))
+        if fusable(predecessor_id) and follower(predecessor_id) == node_id:
+            continue
+        chain = [node_id]
+        next_id = follower(node_id)
+        while next_id is not None and next_id not in chain:
+            chain.append(next_id)
+            next_id = follower(next_id)
+        if len(chain) >= min_length:
+            chains.append(chain)
+
+    fused = []
+    # the FusedChain now standing in for each fused operator, in case one chain feeds another
+    owners = {}
+    for chain in chains:
+        stages = [events[node_id] for node_id in chain]
+        source = stages[0].parameters[0]
+        consumers = [events[successor_id] for successor_id in successors[chain[-1]]]
+        network.remove(*stages)
+        fused_chain = FusedChain(source, stages)
+        network.connect(owners.get(source, source), fused_chain)
+        for consumer in consumers:
+            network.connect(fused_chain, consumer)
+        for stage in stages:
+            owners[stage] = fused_chain
+        fused.append(fused_chain)
+    return fused
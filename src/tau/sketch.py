@@ -0,0 +1,305 @@
+import hashlib
+import math
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Any, Callable, List, Sequence
+
+
+class DDSketch:
+    """
+    Quantile sketch with a relative error guarantee (Masson, Rim & Lee, "DDSketch: A Fast and Fully-Mergeable
+    Quantile Sketch with Relative-Error Guarantees", VLDB 2019): every quantile it returns is within
+    relative_accuracy of the true value at that rank, e.g. a p99 latency of 250ms is reported as between
+    247.5ms and 252.5ms at the default 1%, however skewed the data.
+
+    Values are counted in logarithmically sized buckets, so memory grows with the log of the range of values
+    seen rather than with their number: about 800 buckets cover 1us to 10s at 1%. If more than max_buckets
+    are needed per sign, the buckets for the smallest magnitudes of that sign are collapsed into one. For
+    positive values that loses the guarantee at the lowest quantiles; for negative values it is lost at the
+    quantiles of the negatives nearest zero, i.e. just below the positive and zero values. Weights may be
+    fractional, for decayed sketches. Sketches with the same relative_accuracy can be merged, e.g. to combine
+    the sketches of several shards.
+    """
+    __slots__ = ('relative_accuracy', 'gamma', 'log_gamma', 'max_buckets', 'positive', 'negative', 'zero_count',
+                 'count')
+
+    # magnitudes below this are counted as zero
+    min_value = 1e-9
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError(f"relative_accuracy must be between 0 and 1: {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.positive = BucketStore(max_buckets)
+        self.negative = BucketStore(max_buckets)
+        self.zero_count = 0.0
+        self.count = 0.0
+
+    def add(self, value: float, weight: float = 1.0):
+        if value > self.min_value:
+            self.positive.add(math.ceil(math.log(value) / self.log_gamma), weight)
+        elif value < -self.min_value:
+            self.negative.add(math.ceil(math.log(-value) / self.log_gamma), weight)
+        else:
+            self.zero_count += weight
+        self.count += weight
+
+    def quantile(self, q: float) -> float:
+        """
+        :return: the estimated value at quantile q, between 0 and 1, or None if the sketch is empty
+        """
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """
+        :return: the estimated values at each of the quantiles qs, sharing one pass over the buckets
+        """
+        for q in qs:
+            if not 0.0 <= q <= 1.0:
+                raise ValueError(f"quantile must be between 0 and 1: {q}")
+        if self.count <= 0.0:
+            return [None] * len(qs)
+        # negative values are stored by magnitude, so the lowest values are in the highest buckets
+        negative_totals = self.negative.running_totals(from_top=True)
+        positive_totals = self.positive.running_totals()
+        values = []
+        for q in qs:
+            rank = q * self.count
+            # checking for empty stores covers q = 1 when there are no values above them
+            if rank < self.negative.count or not (positive_totals or self.zero_count):
+                values.append(-self.__value(self.negative.key_at_rank(negative_totals, rank, from_top=True)))
+            elif rank < self.negative.count + self.zero_count or not positive_totals:
+                values.append(0.0)
+            else:
+                rank -= self.negative.count + self.zero_count
+                values.append(self.__value(self.positive.key_at_rank(positive_totals, rank)))
+        return values
+
+    def merge(self, other: 'DDSketch'):
+        """
+        Adds every value counted by another sketch with the same relative_accuracy to this one.
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("can only merge sketches with the same relative_accuracy")
+        self.positive.merge(other.positive)
+        self.negative.merge(other.negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def scale(self, factor: float):
+        """
+        Multiplies every weight by the given factor.
+        """
+        self.positive.scale(factor)
+        self.negative.scale(factor)
+        self.zero_count *= factor
+        self.count *= factor
+
+    def __value(self, key: int) -> float:
+        # the midpoint of bucket key, (gamma^(key-1), gamma^key], in the sense of relative error
+        return 2.0 * self.gamma ** key / (1.0 + self.gamma)
+
+
+class BucketStore:
+    """
+    Weights of a contiguous range of integer bucket keys, held densely in a list.
+    """
+    __slots__ = ('max_buckets', 'weights', 'offset', 'count')
+
+    def __init__(self, max_buckets: int):
+        self.max_buckets = max_buckets
+        self.weights = []
+        self.offset = 0
+        self.count = 0.0
+
+    def add(self, key: int, weight: float):
+        weights = self.weights
+        if not weights:
+            self.offset = key
+            weights.append(0.0)
+        index = key - self.offset
+        if index < 0:
+            # grow downwards, but not past max_buckets; keys too low to keep go into the lowest bucket
+            extension = min(-index, self.max_buckets - len(weights))
+            if extension > 0:
+                weights[0:0] = [0.0] * extension
+                self.offset -= extension
+            index = max(0, key - self.offset)
+        elif index >= len(weights):
+            weights.extend([0.0] * (index + 1 - len(weights)))
+            if len(weights) > self.max_buckets:
+                self.__collapse(len(weights) - self.max_buckets)
+                index = key - self.offset
+        weights[index] += weight
+        self.count += weight
+
+    def running_totals(self, from_top: bool = False) -> List[float]:
+        """
+        :return: the running totals of the weights from the lowest key up or, if from_top is set, from the
+            highest key down; built in C, which is much faster than walking the buckets
+        """
+        return list(accumulate(reversed(self.weights) if from_top else self.weights))
+
+    def key_at_rank(self, running_totals: List[float], rank: float, from_top: bool = False) -> int:
+        """
+        :return: the key of the bucket holding the value with the given rank, given the running totals
+            counted in the same direction
+        """
+        index = min(bisect_right(running_totals, rank), len(running_totals) - 1)
+        return (len(running_totals) - 1 - index if from_top else index) + self.offset
+
+    def merge(self, other: 'BucketStore'):
+        for index, weight in enumerate(other.weights):
+            if weight:
+                self.add(index + other.offset, weight)
+
+    def scale(self, factor: float):
+        self.weights = [weight * factor for weight in self.weights]
+        self.count *= factor
+
+    def __collapse(self, buckets: int):
+        weights = self.weights
+        weights[buckets] += sum(weights[:buckets])
+        del weights[:buckets]
+        self.offset += buckets
+
+
+class StreamingHistogram:
+    """
+    Weighted counts of values falling into fixed bins, given by their ascending edges: bin i counts values
+    from edges[i] up to, but excluding, edges[i + 1]. Values below the first edge or at or above the last are
+    counted in underflow and overflow. Counts are exact, so the only error is the width of the bins; memory
+    is fixed by the number of bins. Histograms with the same edges can be merged.
+    """
+    __slots__ = ('edges', 'counts', 'underflow', 'overflow', 'count')
+
+    def __init__(self, edges: Sequence[float]):
+        if len(edges) < 2 or any(b <= a for a, b in zip(edges, edges[1:])):
+            raise ValueError("edges must hold at least two strictly ascending values")
+        self.edges = list(edges)
+        self.counts = [0.0] * (len(edges) - 1)
+        self.underflow = 0.0
+        self.overflow = 0.0
+        self.count = 0.0
+
+    def add(self, value: float, weight: float = 1.0):
+        index = bisect_right(self.edges, value) - 1
+        if index < 0:
+            self.underflow += weight
+        elif index >= len(self.counts):
+            self.overflow += weight
+        else:
+            self.counts[index] += weight
+        self.count += weight
+
+    def quantile(self, q: float) -> float:
+        """
+        :return: the value at quantile q, interpolated linearly within its bin, or None if the histogram is
+            empty or q falls in the underflow or overflow
+        """
+        rank = q * self.count
+        if self.count <= 0.0 or rank < self.underflow:
+            return None
+        total = self.underflow
+        for index, weight in enumerate(self.counts):
+            if weight and total + weight >= rank:
+                low, high = self.edges[index], self.edges[index + 1]
+                return low + (high - low) * (rank - total) / weight
+            total += weight
+        return None
+
+    def merge(self, other: 'StreamingHistogram'):
+        if other.edges != self.edges:
+            raise ValueError("can only merge histograms with the same edges")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.count += other.count
+
+    def scale(self, factor: float):
+        self.counts = [weight * factor for weight in self.counts]
+        self.underflow *= factor
+        self.overflow *= factor
+        self.count *= factor
+
+
+def stable_hash(value: Any) -> int:
+    """
+    A 64-bit hash of a value's repr() that, unlike hash(), is the same in every process, so HyperLogLogs
+    built in different processes can be merged.
+    """
+    return int.from_bytes(hashlib.blake2b(repr(value).encode(), digest_size=8).digest(), 'little')
+
+
+class HyperLogLog:
+    """
+    Approximate distinct count (Flajolet et al., "HyperLogLog: the analysis of a near-optimal cardinality
+    estimation algorithm", 2007) using 2^precision one-byte registers; the standard error of the estimate is
+    about 1.04 / sqrt(2^precision), e.g. 1.6% in 4KB at the default precision of 12. Small counts use linear
+    counting, which is near exact. Sketches with the same precision and hash function can be merged.
+
+    The estimate is maintained incrementally, so adding a value and reading the estimate are both O(1).
+    """
+    __slots__ = ('precision', 'hash_function', 'registers', 'register_sum', 'zeros')
+
+    def __init__(self, precision: int = 12, hash_function: Callable[[Any], int] = stable_hash):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"precision must be between 4 and 16: {precision}")
+        self.precision = precision
+        self.hash_function = hash_function
+        self.registers = bytearray(1 << precision)
+        # sum of 2^-register over all registers, and the number of registers still zero
+        self.register_sum = float(1 << precision)
+        self.zeros = 1 << precision
+
+    def add(self, value: Any):
+        register, rank = self.register_and_rank(value)
+        self.update_register(register, rank)
+
+    def register_and_rank(self, value: Any):
+        """
+        :return: the register the value maps to and the rank to record in it
+        """
+        hashed = self.hash_function(value) & 0xFFFFFFFFFFFFFFFF
+        register = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        return register, rank
+
+    def update_register(self, register: int, rank: int):
+        old_rank = self.registers[register]
+        if rank > old_rank:
+            self.set_register(register, rank)
+
+    def set_register(self, register: int, rank: int):
+        old_rank = self.registers[register]
+        self.registers[register] = rank
+        self.register_sum += 2.0 ** -rank - 2.0 ** -old_rank
+        self.zeros += (rank == 0) - (old_rank == 0)
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1.0 + 1.079 / m)
+        raw = alpha * m * m / self.register_sum
+        if raw <= 2.5 * m and self.zeros:
+            return m * math.log(m / self.zeros)
+        return raw
+
+    def merge(self, *others: 'HyperLogLog'):
+        """
+        Adds every value counted by other sketches with the same precision and hash function to this one.
+        """
+        if any(other.precision != self.precision for other in others):
+            raise ValueError("can only merge sketches with the same precision")
+        if any(other.hash_function is not self.hash_function for other in others):
+            raise ValueError("can only merge sketches with the same hash function")
+        self.registers = bytearray(map(max, self.registers, *(other.registers for other in others)))
+        self.register_sum = sum(map(INVERSE_POWERS_OF_TWO.__getitem__, self.registers))
+        self.zeros = self.registers.count(0)
+
+
+# 2^-rank for every rank a register can hold
+INVERSE_POWERS_OF_TWO = [2.0 ** -rank for rank in range(66)]
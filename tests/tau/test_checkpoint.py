@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+import pytest
+
+from tau.checkpoint import Checkpointer
+from tau.core import MutableSignal, Network, HistoricalNetworkScheduler
+from tau.math import Mean, Stddev, ExponentialMovingAverage, RollingMax, DecayedQuantile, RollingDistinctCount
+from tau.signal import Map, Scan, WindowWithCount
+
+
+def build(network: Network):
+    values = MutableSignal()
+    doubled = Map(network, values, lambda x: x * 2)
+    outputs = [Mean(network, values), Stddev(network, values), ExponentialMovingAverage(network, values),
+               Scan(network, doubled), WindowWithCount(network, values, 3), RollingMax(network, values, 3),
+               DecayedQuantile(network, values, 2, [0.1, 0.9]), RollingDistinctCount(network, values, 4, panes=2)]
+    return values, outputs
+
+
+def feed(network: Network, values: MutableSignal, ticks):
+    for value in ticks:
+        values.set_value(value)
+        network.activate(values)
+
+
+def test_checkpoint_and_restore():
+    network = Network()
+    values, outputs = build(network)
+    feed(network, values, [3.0, 1.0, 4.0, 1.0, 5.0])
+    snapshot = network.checkpoint()
+    feed(network, values, [9.0, 2.0])
+
+    restored_network = Network()
+    restored_values, restored_outputs = build(restored_network)
+    restored_network.restore(snapshot)
+    feed(restored_network, restored_values, [9.0, 2.0])
+    assert [output.get_value() for output in restored_outputs] == [output.get_value() for output in outputs]
+
+
+def test_incremental_checkpoints():
+    network = Network()
+    a, b = MutableSignal(), MutableSignal()
+    a_mean, b_mean = Mean(network, a), Mean(network, b)
+    feed(network, a, [1.0, 2.0])
+    feed(network, b, [10.0])
+    full = network.checkpoint()
+    feed(network, a, [6.0])
+    delta = network.checkpoint(incremental=True)
+
+    restored_network = Network()
+    restored_a, restored_b = MutableSignal(), MutableSignal()
+    restored_a_mean, restored_b_mean = Mean(restored_network, restored_a), Mean(restored_network, restored_b)
+    assert len(delta) < len(full)
+    restored_network.restore(full, delta)
+    assert (restored_a_mean.get_value(), restored_b_mean.get_value()) == (3.0, 10.0)
+
+
+def test_restore_rejects_different_graph():
+    network = Network()
+    build(network)
+    snapshot = network.checkpoint()
+
+    other = Network()
+    values = MutableSignal()
+    Mean(other, values)
+    with pytest.raises(ValueError):
+        other.restore(snapshot)
+
+
+def test_periodic_checkpointer(tmp_path):
+    path = str(tmp_path / 'network.ckpt')
+    scheduler = HistoricalNetworkScheduler()
+    values = MutableSignal()
+    mean = Mean(scheduler.get_network(), values)
+    checkpointer = Checkpointer(scheduler, path, timedelta(seconds=1), full_every=3)
+    scheduler.schedule_updates_at((float(t) + 0.5, values, float(t)) for t in range(5))
+    scheduler.run(until=5.0)
+    checkpointer.cancel()
+
+    # a crash part way through appending another checkpoint leaves a truncated record behind
+    with open(path, 'ab') as f:
+        f.write(b'\x10\x00')
+
+    restored_network = Network()
+    restored_values = MutableSignal()
+    restored_mean = Mean(restored_network, restored_values)
+    Checkpointer.restore(restored_network, path)
+    assert restored_mean.get_value() == mean.get_value() == 2.0
@@ -1,6 +1,20 @@
+import asyncio
+import inspect
+import json
+import queue
+from datetime import timedelta
 from unittest.mock import Mock
 
-from tau.core import Network, Event
+import pytest
+
+import tau.core
+import tau.event
+import tau.math
+import tau.shard
+import tau.signal
+from tau.core import Network, Event, HistoricalNetworkScheduler, MutableSignal, SimulatedClock, NetworkScheduler, \
+    KeepLatest, MergeWith
+from tau.event import Do
 
 
 def test_event_propagation():
@@ -34,3 +48,457 @@ def test_event_short_circuit():
     b.on_activate.assert_not_called()
     c.on_activate.assert_not_called()
 
+
+def test_diamond_activates_each_node_once():
+    network = Network()
+
+    a = Mock(spec=Event)
+    a.on_activate.return_value = True
+    b = Mock(spec=Event)
+    c = Mock(spec=Event)
+    d = Mock(spec=Event)
+
+    network.connect(a, b)
+    network.connect(a, c)
+    network.connect(b, d)
+    network.connect(c, d)
+    network.activate(a)
+    d.on_activate.assert_called_once()
+    assert network.has_activated(d)
+
+
+def test_activation_only_visits_reachable_nodes():
+    network = Network()
+
+    a = Mock(spec=Event)
+    b = Mock(spec=Event)
+    c = Mock(spec=Event)
+
+    network.connect(a, b)
+    network.connect(c, b)
+    network.activate(a)
+    network.activate(a)
+    assert b.on_activate.call_count == 2
+    c.on_activate.assert_not_called()
+    assert not network.has_activated(c)
+
+
+def test_plan_rebuilt_on_connect():
+    network = Network()
+
+    a = Mock(spec=Event)
+    b = Mock(spec=Event)
+    c = Mock(spec=Event)
+
+    network.connect(a, b)
+    network.activate(a)
+    network.connect(a, c)
+    network.activate(a)
+    assert b.on_activate.call_count == 2
+    c.on_activate.assert_called_once()
+
+    network.disconnect(a, c)
+    network.activate(a)
+    c.on_activate.assert_called_once()
+
+
+def test_historical_scheduler_runs_in_time_order():
+    scheduler = HistoricalNetworkScheduler(clock=SimulatedClock(100.0))
+    signal = MutableSignal()
+    seen = []
+    Do(scheduler.get_network(), signal, lambda: seen.append((scheduler.get_time(), signal.get_value())))
+
+    scheduler.schedule_update_at(signal, 'b', 102.0)
+    scheduler.schedule_update_at(signal, 'a', 101.0)
+    scheduler.schedule_update_at(signal, 'c', 102.0)
+    scheduler.schedule_timer(timedelta(seconds=5), lambda: seen.append((scheduler.get_time(), 'timer')))
+    scheduler.schedule_timer(timedelta(seconds=6), lambda: seen.append((scheduler.get_time(), 'cancelled'))).cancel()
+    scheduler.run()
+    assert seen == [(101.0, 'a'), (102.0, 'b'), (102.0, 'c'), (105.0, 'timer')]
+
+
+def test_historical_scheduler_run_until():
+    scheduler = HistoricalNetworkScheduler()
+    signal = MutableSignal()
+    scheduler.schedule_update_at(signal, 1, 10.0)
+    scheduler.schedule_update_at(signal, 2, 30.0)
+    scheduler.run(until=20.0)
+    assert signal.get_value() == 1
+    assert scheduler.get_time() == 20.0
+    scheduler.run()
+    assert signal.get_value() == 2
+    assert scheduler.get_time() == 30.0
+
+
+def test_profiling():
+    network = Network()
+
+    a = Mock(spec=Event)
+    a.on_activate.return_value = True
+    b = Mock(spec=Event)
+    b.on_activate.return_value = True
+    c = Mock(spec=Event)
+    c.on_activate.return_value = False
+    d = Mock(spec=Event)
+
+    network.connect(a, b)
+    network.connect(a, c)
+    network.connect(b, d)
+    network.connect(c, d)
+    network.activate(a)
+    profiler = network.enable_profiling()
+    network.activate(a)
+    network.activate(a)
+
+    snapshot = profiler.snapshot()
+    assert snapshot['ticks'] == 2
+    assert snapshot['depth']['max'] == 2
+    assert snapshot['fan_out']['max'] == 3
+    nodes = {node['node_id']: node for node in snapshot['nodes']}
+    assert nodes[network.node_id_map[b]]['fired'] == 2
+    assert nodes[network.node_id_map[c]]['not_fired'] == 2
+    assert nodes[network.node_id_map[d]]['activations'] == 2
+
+    network.disable_profiling()
+    network.activate(a)
+    assert profiler.snapshot()['ticks'] == 2
+
+
+def test_profiler_export(tmp_path):
+    network = Network()
+    a = Mock(spec=Event)
+    network.connect(a, Mock(spec=Event))
+    profiler = network.enable_profiling()
+    network.activate(a)
+
+    profiler.write_json(str(tmp_path / 'profile.json'))
+    profiler.write_prometheus(str(tmp_path / 'profile.prom'))
+    assert json.loads((tmp_path / 'profile.json').read_text())['ticks'] == 1
+    assert 'tau_node_activations_total{node="1",type="Mock",fired="true"} 1' in (tmp_path / 'profile.prom').read_text()
+
+
+def test_nodes_have_no_instance_dict():
+    for module in [tau.core, tau.event, tau.signal, tau.math, tau.shard]:
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if issubclass(cls, Event) and cls.__module__ == module.__name__:
+                assert cls.__dictoffset__ == 0, f'{cls.__name__} is missing __slots__'
+
+
+def test_historical_bulk_updates_keep_scheduling_order():
+    scheduler = HistoricalNetworkScheduler()
+    signal = MutableSignal()
+    seen = []
+    Do(scheduler.get_network(), signal, lambda: seen.append(signal.get_value()))
+    scheduler.schedule_updates(((signal, i) for i in range(5)), batch_size=2)
+    scheduler.schedule_updates(((signal, i) for i in range(100, 105)), batch_size=2)
+    scheduler.run()
+    assert seen == list(range(5)) + list(range(100, 105))
+
+
+def test_conflation():
+    delivered = {'latest': [], 'latest3': [], 'merged': []}
+
+    async def main():
+        scheduler = NetworkScheduler()
+        network = scheduler.get_network()
+        latest = MutableSignal(conflation=KeepLatest())
+        latest3 = MutableSignal(conflation=KeepLatest(3))
+        merged = MutableSignal(conflation=MergeWith(lambda pending, value: pending + value))
+        for name, signal in [('latest', latest), ('latest3', latest3), ('merged', merged)]:
+            Do(network, signal, lambda n=name, s=signal: delivered[n].append(s.get_value()))
+
+        for i in range(1, 11):
+            for signal in [latest, latest3, merged]:
+                scheduler.schedule_update(signal, i)
+        await asyncio.sleep(0)
+        scheduler.schedule_update(latest, 11)
+        await asyncio.sleep(0)
+
+        assert latest.conflation.stats() == {'updates': 11, 'dropped': 9, 'merged': 0, 'delivered': 2}
+        assert latest3.conflation.stats() == {'updates': 10, 'dropped': 7, 'merged': 0, 'delivered': 3}
+        assert merged.conflation.stats() == {'updates': 10, 'dropped': 0, 'merged': 9, 'delivered': 1}
+
+    asyncio.run(main())
+    assert delivered == {'latest': [10, 11], 'latest3': [8, 9, 10], 'merged': [55]}
+
+
+@pytest.mark.parametrize('historical', [False, True])
+def test_conflation_in_live_and_replay(historical):
+    delivered = []
+
+    async def main():
+        scheduler = HistoricalNetworkScheduler() if historical else NetworkScheduler()
+        latest = MutableSignal(conflation=KeepLatest())
+        Do(scheduler.get_network(), latest, lambda: delivered.append(latest.get_value()))
+        for i in range(1, 4):
+            scheduler.schedule_update(latest, i)
+        scheduler.schedule_updates([(latest, i) for i in range(4, 7)])
+        if historical:
+            scheduler.run()
+        else:
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+        assert latest.conflation.stats() == {'updates': 6, 'dropped': 4, 'merged': 0, 'delivered': 2}
+
+    asyncio.run(main())
+    assert delivered == [3, 6]
+
+
+def test_async_updates_are_applied_as_they_arrive():
+    delivered = []
+    closed = []
+
+    async def main():
+        scheduler = NetworkScheduler()
+        latest = MutableSignal(conflation=KeepLatest())
+        Do(scheduler.get_network(), latest, lambda: delivered.append(latest.get_value()))
+
+        async def updates():
+            try:
+                for i in range(5):
+                    yield latest, i
+            finally:
+                closed.append(True)
+
+        await scheduler.schedule_updates(updates(), batch_size=2)
+        assert latest.conflation.stats() == {'updates': 5, 'dropped': 0, 'merged': 0, 'delivered': 5}
+
+    asyncio.run(main())
+    assert delivered == [0, 1, 2, 3, 4]
+    assert closed == [True]
+
+
+@pytest.mark.parametrize('historical', [False, True])
+def test_conflation_in_timestamped_replay(historical):
+    delivered = []
+
+    async def main():
+        scheduler = HistoricalNetworkScheduler() if historical else NetworkScheduler()
+        latest = MutableSignal(conflation=KeepLatest())
+        plain = MutableSignal()
+        Do(scheduler.get_network(), latest, lambda: delivered.append(latest.get_value()))
+        Do(scheduler.get_network(), plain, lambda: delivered.append(plain.get_value()))
+        # live, timestamps already passed are replayed straight away
+        start = scheduler.get_time() - (0.0 if historical else 10.0)
+        trades = [(start, latest, 'a'), (start, latest, 'b'), (start, plain, 'x'), (start, latest, 'c'),
+                  (start + 1.0, latest, 'd'), (start + 2.0, latest, 'e'), (start + 2.0, latest, 'f')]
+        # a batch size of two splits each timestamp's updates across queue entries or event loop iterations
+        task = scheduler.replay(trades, batch_size=2)
+        if historical:
+            scheduler.run()
+        else:
+            await task
+        assert latest.conflation.stats() == {'updates': 6, 'dropped': 3, 'merged': 0, 'delivered': 3}
+
+    asyncio.run(main())
+    assert delivered == ['x', 'c', 'd', 'f']
+
+
+def test_replay_merges_streams_in_time_order():
+    scheduler = HistoricalNetworkScheduler()
+    trades, quotes, refs = MutableSignal(), MutableSignal(), MutableSignal()
+    seen = []
+    for name, signal in [('trade', trades), ('quote', quotes), ('ref', refs)]:
+        Do(scheduler.get_network(), signal, lambda n=name, s=signal: seen.append((scheduler.get_time(), n,
+                                                                                    s.get_value())))
+    pulled = []
+
+    def stream(signal, ticks):
+        for timestamp, value in ticks:
+            pulled.append(value)
+            yield timestamp, signal, value
+
+    scheduler.replay(stream(quotes, [(1.0, 'q1'), (2.0, 'q2'), (4.0, 'q4')]),
+                     stream(trades, [(2.0, 't2'), (3.0, 't3')]),
+                     stream(refs, [(0.5, 'r0'), (4.0, 'r4')]))
+    # only the head of each stream is read ahead of time
+    assert sorted(pulled) == ['q1', 'r0', 't2']
+
+    scheduler.run()
+    assert seen == [(0.5, 'ref', 'r0'), (1.0, 'quote', 'q1'), (2.0, 'quote', 'q2'), (2.0, 'trade', 't2'),
+                    (3.0, 'trade', 't3'), (4.0, 'quote', 'q4'), (4.0, 'ref', 'r4')]
+
+
+def test_timer_service_shares_one_scheduled_callback():
+    scheduler = HistoricalNetworkScheduler()
+    timers = scheduler.get_timer_service()
+    fired = []
+    for i in range(1000):
+        timers.schedule_periodic(timedelta(milliseconds=10 * (1 + i % 3)), lambda i=i: fired.append(i))
+    cancelled = timers.schedule(timedelta(milliseconds=5), lambda: fired.append('cancelled'))
+    cancelled.cancel()
+
+    def armed():
+        return sum(not scheduled.cancelled for _, _, scheduled in scheduler.queue)
+
+    assert armed() == 1
+    scheduler.run(until=0.03)
+    assert armed() == 1
+    # at 10ms, 20ms and 30ms in creation order; the 20ms and 30ms timers share ticks with the 10ms ones
+    assert fired.count(0) == 3 and fired.count(1) == 1 and fired.count(2) == 1
+    assert fired[:334] == list(range(0, 1000, 3))
+    assert 'cancelled' not in fired
+
+
+def test_remove_subgraph():
+    network = Network()
+    feed = MutableSignal()
+    other = MutableSignal()
+    seen = []
+    aapl = Do(network, feed, lambda: seen.append('aapl'))
+    msft = Do(network, feed, lambda: seen.append('msft'))
+    Do(network, other, lambda: seen.append('other'))
+    for source in [feed, other]:
+        source.set_value(1)
+        network.activate(source)
+    other_plan = network.propagation_plans[other]
+
+    network.remove(aapl)
+    assert network.propagation_plans[other] is other_plan
+    assert feed not in network.propagation_plans
+    feed.set_value(2)
+    network.activate(feed)
+    assert seen == ['aapl', 'msft', 'other', 'msft']
+
+    # the freed node ID is reused
+    node_count = len(network.events)
+    tsla = Do(network, feed, lambda: seen.append('tsla'))
+    assert len(network.events) == node_count
+    assert not network.has_activated(tsla)
+    assert [len(component) for component in network.components()] == [3, 2]
+
+
+def test_removed_nodes_stay_removed():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    values = MutableSignal()
+    buffer = tau.signal.BufferWithTime(scheduler, values, timedelta(seconds=1))
+    window = tau.signal.WindowWithTime(scheduler, values, timedelta(seconds=1))
+    scheduler.schedule_update_at(values, 1, 0.5)
+    scheduler.run(until=0.6)
+
+    network.remove(buffer, window)
+    assert buffer.timer.cancelled and window.timer is None
+    scheduler.run(until=5.0)
+    network.activate(buffer)
+    assert buffer not in network.node_id_map and window not in network.node_id_map
+    assert buffer.get_value() is None
+
+    # connecting a removed event explicitly adds it back
+    network.connect(values, buffer)
+    assert buffer in network.node_id_map
+
+
+def test_remove_during_propagation_is_deferred():
+    network = Network()
+    feed = MutableSignal()
+    seen = []
+    first = Do(network, feed, lambda: network.remove(first, second))
+    second = Do(network, feed, lambda: seen.append(feed.get_value()))
+    for value in [1, 2]:
+        feed.set_value(value)
+        network.activate(feed)
+    assert seen == [1]
+    assert first not in network.node_id_map and second not in network.node_id_map
+
+
+def test_disconnect_keeps_other_edges():
+    network = Network()
+    a, b = MutableSignal(), MutableSignal()
+    seen = []
+    c = Do(network, a, lambda: seen.append('c'))
+    network.connect(b, c)
+    network.disconnect(a, c)
+    network.disconnect(a, c)
+    for source in [a, b]:
+        source.set_value(1)
+        network.activate(source)
+    assert seen == ['c']
+
+
+def test_ingestion_queue_from_threads():
+    received = []
+    stats = {}
+
+    async def main():
+        scheduler = NetworkScheduler()
+        signal = MutableSignal()
+        Do(scheduler.get_network(), signal, lambda: received.append(signal.get_value()))
+        ingestion = scheduler.create_ingestion_queue(maxsize=100, batch_size=50)
+
+        def produce(producer):
+            for i in range(1000):
+                ingestion.put(signal, (producer, i))
+
+        loop = asyncio.get_event_loop()
+        await asyncio.gather(*[loop.run_in_executor(None, produce, producer) for producer in range(4)])
+        while ingestion.qsize() or ingestion.drain_scheduled:
+            await asyncio.sleep(0.001)
+        stats.update(ingestion.stats())
+
+    asyncio.run(main())
+    assert len(received) == 4000
+    for producer in range(4):
+        assert [i for p, i in received if p == producer] == list(range(1000))
+    assert stats['delivered'] == stats['enqueued'] == 4000
+    assert stats['depth'] == 0 and stats['max_depth'] <= 100
+    assert stats['wakeups'] <= stats['batches'] < 4000
+
+
+def test_ingestion_queue_is_bounded():
+    async def main():
+        scheduler = NetworkScheduler()
+        signal = MutableSignal()
+        ingestion = scheduler.create_ingestion_queue(maxsize=2)
+        ingestion.put(signal, 1)
+        ingestion.put(signal, 2)
+        with pytest.raises(queue.Full):
+            ingestion.put(signal, 3, block=False)
+        await asyncio.sleep(0)
+        ingestion.put(signal, 3, block=False)
+        await asyncio.sleep(0)
+        assert signal.get_value() == 3
+
+    asyncio.run(main())
+
+
+def test_ingestion_queue_refuses_to_block_on_loop_thread():
+    async def main():
+        scheduler = NetworkScheduler()
+        signal = MutableSignal()
+        ingestion = scheduler.create_ingestion_queue(maxsize=1)
+        ingestion.put(signal, 1)
+        with pytest.raises(RuntimeError):
+            ingestion.put(signal, 2)
+        await asyncio.sleep(0)
+        assert signal.get_value() == 1
+
+    asyncio.run(main())
+
+
+def test_ingestion_queue_requeues_rest_of_batch_on_error():
+    async def main():
+        scheduler = NetworkScheduler()
+        network = scheduler.get_network()
+        signal = MutableSignal()
+        seen = []
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context["exception"]))
+
+        def record():
+            value = signal.get_value()
+            if value == 2 and not errors:
+                raise ValueError(value)
+            seen.append(value)
+
+        Do(network, signal, record)
+        ingestion = scheduler.create_ingestion_queue()
+        for value in range(1, 5):
+            ingestion.put(signal, value)
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert len(errors) == 1
+        assert seen == [1, 3, 4]
+        assert ingestion.stats()["delivered"] == 4
+
+    asyncio.run(main())
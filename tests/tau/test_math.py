@@ -1,10 +1,19 @@
 import asyncio
 import math
+import random
+import statistics
+from datetime import timedelta
 
-from tau.core import NetworkScheduler
+import pytest
+
+from tau.core import NetworkScheduler, HistoricalNetworkScheduler, MutableSignal
 from tau.event import Lambda
-from tau.math import RunningSum, Max, Min, Mean, Stddev
-from tau.signal import From
+from tau.math import RunningSum, Max, Min, Mean, Stddev, ExponentialMovingAverage, WeightedMovingAverage, \
+    RollingSum, RollingMean, RollingVariance, RollingStddev, RollingMin, RollingMax, KeyedRunningSum, KeyedMin, \
+    KeyedMax, KeyedMean, KeyedStddev, KeyedExponentialMovingAverage, KeyedRollingSum, KeyedRollingMean, Quantile, \
+    DecayedQuantile, Histogram, DecayedHistogram, DistinctCount, RollingDistinctCount
+from tau.signal import From, FromArray, KeyedScan, Map
+from tau.sketch import HyperLogLog
 
 
 def test_running_sum():
@@ -49,3 +58,247 @@ def test_descriptive_stats():
     assert check_values[1].get_value() == 0.0
     assert check_values[2].get_value() == 3.7
     assert math.isclose(check_values[3].get_value(), 3.24507, abs_tol=0.00001)
+
+
+def test_rolling_stats_by_count():
+    data = [5.0, 3.2, 2.1, 2.9, 8.3, 5.7, 1.0, 1.0, 9.4]
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    values = From(scheduler, data)
+    stats = [RollingSum(network, values, 3), RollingMean(network, values, 3), RollingVariance(network, values, 3),
+             RollingStddev(network, values, 3), RollingMin(network, values, 3), RollingMax(network, values, 3)]
+    results = []
+    Lambda(network, stats, lambda x: results.append([stat.get_value() for stat in x]))
+    scheduler.run()
+
+    assert len(results) == len(data)
+    for i, result in enumerate(results):
+        window = data[max(0, i - 2):i + 1]
+        variance = statistics.variance(window) if len(window) > 1 else 0.0
+        expected = [sum(window), statistics.mean(window), variance, math.sqrt(variance), min(window), max(window)]
+        assert result == pytest.approx(expected)
+
+
+def test_rolling_stats_by_time():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    values = MutableSignal()
+    total = RollingSum(network, values, timedelta(seconds=10), scheduler.get_clock())
+    highest = RollingMax(network, values, timedelta(seconds=10), scheduler.get_clock())
+    for timestamp, value in [(0.0, 4.0), (5.0, 1.0), (9.0, 2.0), (12.0, 3.0), (30.0, 0.5)]:
+        scheduler.schedule_update_at(values, value, timestamp)
+
+    scheduler.run(until=9.0)
+    assert (total.get_value(), highest.get_value()) == (7.0, 4.0)
+    scheduler.run(until=12.0)
+    assert (total.get_value(), highest.get_value()) == (6.0, 3.0)
+    scheduler.run()
+    assert (total.get_value(), highest.get_value()) == (0.5, 0.5)
+
+
+def test_rolling_sum_is_compensated():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    values = From(scheduler, [1e16, 1.0, 1.0])
+    total = RollingSum(network, values, 2)
+    mean = RollingMean(network, values, 2)
+    scheduler.run()
+    assert (total.get_value(), mean.get_value()) == (2.0, 1.0)
+    keyed_total = KeyedRollingSum(network, values, lambda _: 'key', 2)
+    keyed_mean = KeyedRollingMean(network, values, lambda _: 'key', 2)
+    for value in [1e16, 1.0, 1.0]:
+        values.set_value(value)
+        network.activate(values)
+    assert (keyed_total.get('key'), keyed_mean.get('key')) == (2.0, 1.0)
+
+    for window in [timedelta(0), timedelta(seconds=-1)]:
+        with pytest.raises(ValueError):
+            RollingSum(network, values, window, scheduler.get_clock())
+
+
+def test_batch_mode_matches_scalar():
+    np = pytest.importorskip('numpy')
+    data = np.random.default_rng(42).normal(100.0, 5.0, 1000)
+
+    def run(make_values):
+        scheduler = HistoricalNetworkScheduler()
+        network = scheduler.get_network()
+        values = make_values(scheduler)
+        operators = [RunningSum(network, values), Mean(network, values), ExponentialMovingAverage(network, values),
+                     WeightedMovingAverage(network, values, 0.3)]
+        outputs = [[] for _ in operators]
+        for operator, output in zip(operators, outputs):
+            Lambda(network, operator, lambda x, out=output: out.append(x[0].get_value()))
+        scheduler.run()
+        return outputs
+
+    scalar_outputs = run(lambda scheduler: From(scheduler, data.tolist()))
+    batch_outputs = run(lambda scheduler: FromArray(scheduler, data, chunk_size=77))
+    for scalar_output, batch_output in zip(scalar_outputs, batch_outputs):
+        assert np.concatenate(batch_output).tolist() == scalar_output
+
+
+def test_batch_mode_rejected_without_support():
+    np = pytest.importorskip('numpy')
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    values = FromArray(scheduler, np.arange(10.0))
+    # batch mode carries through operators that support it
+    assert Mean(network, Map(network, values, lambda x: x * 2)).batched
+    with pytest.raises(TypeError):
+        Min(network, values)
+    with pytest.raises(TypeError):
+        RollingSum(network, Map(network, values, lambda x: x * 2), 3)
+
+
+def test_keyed_stats_match_per_key_operators():
+    trades = [('AAPL', 3.0), ('MSFT', 10.0), ('AAPL', 1.0), ('AAPL', 4.0), ('MSFT', 12.0), ('GOOG', 7.0),
+              ('AAPL', 1.5), ('MSFT', 11.0)]
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    feed = From(scheduler, trades)
+
+    def symbol(trade):
+        return trade[0]
+
+    def price(trade):
+        return trade[1]
+
+    keyed = {
+        'sum': KeyedRunningSum(network, feed, symbol, price),
+        'min': KeyedMin(network, feed, symbol, price),
+        'max': KeyedMax(network, feed, symbol, price),
+        'mean': KeyedMean(network, feed, symbol, price),
+        'stddev': KeyedStddev(network, feed, symbol, price),
+        'ema': KeyedExponentialMovingAverage(network, feed, symbol, price),
+        'rolling_sum': KeyedRollingSum(network, feed, symbol, 2, price),
+        'rolling_mean': KeyedRollingMean(network, feed, symbol, 2, price),
+        'count': KeyedScan(network, feed, symbol, lambda n, _: n + 1, 0),
+    }
+    emitted = []
+    Lambda(network, keyed['mean'], lambda x: emitted.append(x[0].get_value()))
+    scheduler.run()
+
+    assert emitted[:3] == [('AAPL', 3.0), ('MSFT', 10.0), ('AAPL', 2.0)]
+    assert set(keyed['sum'].keys()) == {'AAPL', 'MSFT', 'GOOG'}
+    assert keyed['sum'].get('TSLA') is None
+    for key in ['AAPL', 'MSFT', 'GOOG']:
+        prices = [p for s, p in trades if s == key]
+        per_key = HistoricalNetworkScheduler()
+        values = From(per_key, prices)
+        ema = ExponentialMovingAverage(per_key.get_network(), values)
+        per_key.run()
+
+        assert keyed['sum'].get(key) == sum(prices)
+        assert keyed['min'].get(key) == min(prices)
+        assert keyed['max'].get(key) == max(prices)
+        assert keyed['mean'].get(key) == pytest.approx(statistics.mean(prices))
+        assert keyed['stddev'].get(key) == pytest.approx(statistics.stdev(prices) if len(prices) > 1 else 0.0)
+        assert keyed['ema'].get(key) == pytest.approx(ema.get_value())
+        assert keyed['rolling_sum'].get(key) == sum(prices[-2:])
+        assert keyed['rolling_mean'].get(key) == pytest.approx(statistics.mean(prices[-2:]))
+        assert keyed['count'].get(key) == len(prices)
+
+
+def test_quantile_within_relative_accuracy():
+    rng = random.Random(7)
+    data = [rng.lognormvariate(0.0, 2.0) * rng.choice([1.0, 1.0, 1.0, -1.0]) for _ in range(5000)]
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    values = MutableSignal()
+    quantiles = [0.01, 0.25, 0.5, 0.9, 0.99, 0.999]
+    halves = [Quantile(network, values, quantiles), Quantile(network, values, quantiles)]
+    for i, value in enumerate(data):
+        scheduler.schedule_update_at(values, value, float(i))
+    whole = Quantile(network, values, quantiles)
+    scheduler.run()
+
+    ordered = sorted(data)
+    exact = [ordered[int(q * len(ordered))] for q in quantiles]
+    for estimate, value in zip(whole.get_value(), exact):
+        assert abs(estimate - value) <= 0.01 * abs(value)
+
+    # sketches of disjoint shards merge into one of all the values
+    first, second = Quantile(network, MutableSignal(), 0.5), Quantile(network, MutableSignal(), 0.5)
+    for value in data[:2500]:
+        first.sketch.add(value)
+    for value in data[2500:]:
+        second.sketch.add(value)
+    first.sketch.merge(second.sketch)
+    assert first.sketch.quantile(0.5) == pytest.approx(whole.sketch.quantile(0.5))
+    with pytest.raises(ValueError):
+        Quantile(network, values, 1.5)
+
+
+def test_decayed_quantile_and_histograms():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    values = MutableSignal()
+    median = Quantile(network, values)
+    decayed_median = DecayedQuantile(network, values, 10)
+    timed_median = DecayedQuantile(network, values, timedelta(seconds=5), clock=scheduler.get_clock())
+    histogram = Histogram(network, values, [0.0, 10.0, 100.0, 1000.0])
+    decayed_histogram = DecayedHistogram(network, values, [0.0, 10.0, 100.0, 1000.0], 1)
+    for i in range(100):
+        scheduler.schedule_update_at(values, 1.0, float(i))
+    for i in range(100, 150):
+        scheduler.schedule_update_at(values, 500.0, float(i))
+    scheduler.run()
+
+    assert median.get_value() == pytest.approx(1.0, rel=0.01)
+    assert decayed_median.get_value() == pytest.approx(500.0, rel=0.01)
+    assert timed_median.get_value() == pytest.approx(500.0, rel=0.01)
+    assert histogram.get_value() == [100.0, 0.0, 50.0]
+    # interpolated linearly within the bin
+    assert histogram.sketch.quantile(0.1) == pytest.approx(1.5)
+    # the latest value counts as one, the one before it as a half and so on
+    assert decayed_histogram.get_value() == pytest.approx([0.0, 0.0, 2.0])
+
+    with pytest.raises(ValueError):
+        DecayedQuantile(network, values, 10, clock=scheduler.get_clock())
+    with pytest.raises(ValueError):
+        DecayedQuantile(network, values, timedelta(seconds=5))
+
+
+def test_decay_survives_long_gaps():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    values = MutableSignal()
+    median = DecayedQuantile(network, values, timedelta(seconds=1), clock=scheduler.get_clock())
+    histogram = DecayedHistogram(network, values, [0.0, 10.0, 100.0], timedelta(seconds=1), scheduler.get_clock())
+    # far more than 1024 half lives apart, past where 2^(age / half_life) overflows a float
+    scheduler.schedule_update_at(values, 1.0, 0.0)
+    scheduler.schedule_update_at(values, 50.0, 1100.0)
+    scheduler.schedule_update_at(values, 50.0, 1101.0)
+    scheduler.run()
+
+    assert median.get_value() == pytest.approx(50.0, rel=0.01)
+    assert histogram.get_value() == pytest.approx([0.0, 1.5])
+
+
+def test_distinct_counts():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    values = MutableSignal()
+    distinct = DistinctCount(network, values)
+    small = DistinctCount(network, values, precision=14)
+    rolling = RollingDistinctCount(network, values, 1000)
+    timed = RollingDistinctCount(network, values, timedelta(seconds=100), scheduler.get_clock(), panes=4)
+    for i in range(15000):
+        scheduler.schedule_update_at(values, f'user-{i % 10000}', float(i))
+    scheduler.run()
+
+    assert distinct.get_value() == pytest.approx(10000, rel=0.05)
+    assert small.get_value() == pytest.approx(10000, rel=0.03)
+    assert rolling.get_value() == pytest.approx(1000, rel=0.2)
+    assert timed.get_value() == pytest.approx(100, rel=0.3)
+
+    shard = DistinctCount(network, MutableSignal())
+    for i in range(5000, 15000):
+        shard.sketch.add(f'user-{i}')
+    shard.sketch.merge(distinct.sketch)
+    assert shard.sketch.estimate() == pytest.approx(15000, rel=0.05)
+    with pytest.raises(ValueError):
+        shard.sketch.merge(small.sketch)
+    with pytest.raises(ValueError):
+        shard.sketch.merge(HyperLogLog(hash_function=hash))
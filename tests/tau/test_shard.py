@@ -0,0 +1,88 @@
+import asyncio
+import os
+
+import pytest
+
+from tau.core import MutableSignal, Network, NetworkScheduler
+from tau.event import Do
+from tau.math import RunningSum
+from tau.shard import ShardedNetworkScheduler
+from tau.signal import Map
+
+
+def test_components():
+    network = Network()
+    a = MutableSignal()
+    b = MutableSignal()
+    a_total = RunningSum(network, a)
+    b_total = RunningSum(network, Map(network, b, lambda x: x * 2))
+
+    components = network.components()
+    assert len(components) == 2
+    assert set(components[0]) == {a, a_total}
+    assert len(components[1]) == 3 and b_total in components[1]
+
+
+def test_sharded_execution():
+    results = {}
+
+    async def main():
+        network = Network()
+        sources = {symbol: MutableSignal() for symbol in ['AAPL', 'MSFT', 'GOOG', 'AMZN']}
+        totals = {symbol: RunningSum(network, Map(network, source, lambda x: x * 10))
+                  for symbol, source in sources.items()}
+
+        scheduler = NetworkScheduler()
+        sharded = ShardedNetworkScheduler(network, list(totals.values()), scheduler, workers=2, batch_size=7)
+        for symbol, total in totals.items():
+            mirror = sharded.get_output(total)
+            Do(scheduler.get_network(), mirror, lambda s=symbol, m=mirror: results.__setitem__(s, m.get_value()))
+        sharded.start()
+
+        for i in range(100):
+            for source in sources.values():
+                sharded.schedule_update(source, float(i))
+        await sharded.close()
+
+    asyncio.run(main())
+    assert results == {symbol: 49500.0 for symbol in ['AAPL', 'MSFT', 'GOOG', 'AMZN']}
+
+
+def test_sharded_error_is_raised_in_parent():
+    results = []
+
+    async def main():
+        network = Network()
+        source = MutableSignal()
+        inverse = Map(network, source, lambda x: 1 / x)
+        scheduler = NetworkScheduler()
+        sharded = ShardedNetworkScheduler(network, [inverse], scheduler, workers=1, batch_size=1)
+        mirror = sharded.get_output(inverse)
+        Do(scheduler.get_network(), mirror, lambda: results.append(mirror.get_value()))
+        sharded.start()
+
+        for x in [1, 0, 4]:
+            sharded.schedule_update(source, x)
+        with pytest.raises(ZeroDivisionError):
+            await sharded.close()
+
+    asyncio.run(main())
+    assert results == [1.0, 0.25]
+
+
+def test_dead_worker_does_not_hang_close():
+    async def main():
+        network = Network()
+        source = MutableSignal()
+        exited = Map(network, source, lambda x: os._exit(3))
+        scheduler = NetworkScheduler()
+        sharded = ShardedNetworkScheduler(network, [exited], scheduler, workers=1)
+        sharded.start()
+
+        sharded.schedule_update(source, 1)
+        with pytest.raises(RuntimeError, match='exit code 3'):
+            await asyncio.wait_for(sharded.close(), 10)
+        with pytest.raises(RuntimeError):
+            sharded.schedule_update(source, 2)
+
+    asyncio.run(main())
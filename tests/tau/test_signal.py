@@ -1,8 +1,15 @@
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-from tau.core import NetworkScheduler
-from tau.event import Do
-from tau.signal import From, Map, Scan, Filter
+import pytest
+
+from tau.core import NetworkScheduler, HistoricalNetworkScheduler, MutableSignal, Network
+from tau.event import Do, Lambda
+from tau.math import Mean, RunningSum
+from tau.signal import Function, From, Map, Scan, Filter, FlatMap, Interval, BufferWithTime, WindowWithCount, \
+    FromArray, FromAsyncIterable, FromTickFile, WindowWithTime, SampleWithTime, LazyMap, CombineLatest, Zip, \
+    WithLatestFrom, AllActivated, AnyActivated, fuse_chains, AsyncMap, SignalUpdates
 
 
 def test_hello_world():
@@ -43,3 +50,567 @@ def test_filter():
 
     asyncio.run(main())
     assert check_values[0].get_value() == 8.3
+
+
+def test_from_generator_in_batches():
+    check_values = []
+
+    async def main():
+        scheduler = NetworkScheduler()
+        network = scheduler.get_network()
+        values = From(scheduler, (float(x) for x in range(10000)), batch_size=64)
+        accumulator = Scan(network, values)
+        check_values.append(accumulator)
+        await values.task
+
+    asyncio.run(main())
+    assert check_values[0].get_value() == sum(range(10000))
+
+
+def test_from_async_iterator():
+    check_values = []
+
+    async def main():
+        async def ticks():
+            for x in [1.0, 2.0, 3.0]:
+                await asyncio.sleep(0)
+                yield x
+
+        scheduler = NetworkScheduler()
+        network = scheduler.get_network()
+        values = From(scheduler, ticks(), batch_size=2)
+        accumulator = Scan(network, values)
+        check_values.append(accumulator)
+        await values.task
+
+    asyncio.run(main())
+    assert check_values[0].get_value() == 6.0
+
+
+def test_from_async_iterator_closed_on_cancel():
+    closed = []
+
+    async def main():
+        async def ticks():
+            try:
+                while True:
+                    await asyncio.sleep(0)
+                    yield 1.0
+            finally:
+                closed.append(True)
+
+        values = From(NetworkScheduler(), ticks())
+        await asyncio.sleep(0.01)
+        values.task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await values.task
+
+    asyncio.run(main())
+    assert closed == [True]
+
+
+def test_flat_map():
+    check_values = []
+
+    async def main():
+        scheduler = NetworkScheduler()
+        network = scheduler.get_network()
+        values = From(scheduler, [[1.0, 2.0], [3.0, 4.0, 5.0]])
+        flattened = FlatMap(scheduler, values)
+        accumulator = Scan(network, flattened)
+        check_values.append(accumulator)
+        await values.task
+        await flattened.join()
+
+    asyncio.run(main())
+    assert check_values[0].get_value() == 15.0
+
+
+def test_from_list_completes_without_waiting():
+    check_values = []
+
+    async def main():
+        scheduler = NetworkScheduler()
+        values = From(scheduler, range(5000))
+        check_values.append(RunningSum(scheduler.get_network(), values))
+
+    asyncio.run(main())
+    assert check_values[0].get_value() == sum(range(5000))
+
+
+def test_signal_updates_pair_values_lazily():
+    signal = MutableSignal()
+    values = [1, 2, 3]
+    updates = SignalUpdates(signal, values)
+    values.append(4)
+    assert len(updates) == 4
+    assert updates[1] == (signal, 2)
+    assert updates[2:] == [(signal, 3), (signal, 4)]
+    assert list(updates) == [(signal, value) for value in values]
+
+
+@pytest.mark.parametrize('historical', [False, True])
+def test_flat_map_keeps_input_order(historical):
+    emitted = []
+
+    async def main():
+        scheduler = HistoricalNetworkScheduler() if historical else NetworkScheduler()
+        values = From(scheduler, [list(range(5)), list(range(100, 105))])
+        flattened = FlatMap(scheduler, values, batch_size=2)
+        Do(scheduler.get_network(), flattened, lambda: emitted.append(flattened.get_value()))
+        if historical:
+            scheduler.run()
+        else:
+            await values.task
+            await flattened.join()
+
+    asyncio.run(main())
+    assert emitted == list(range(5)) + list(range(100, 105))
+
+
+def test_interval_with_historical_scheduler():
+    scheduler = HistoricalNetworkScheduler()
+    values = Interval(scheduler, timedelta(milliseconds=250))
+    buffer = BufferWithTime(scheduler, values, timedelta(seconds=1))
+    batches = []
+    Do(scheduler.get_network(), buffer, lambda: batches.append(buffer.get_value()))
+
+    scheduler.run(until=2.0)
+    assert values.get_value() == 9
+    assert batches == [[1, 2, 3, 4, 5], [6, 7, 8, 9]]
+
+
+def test_buffer_with_time_flushes_on_expiry():
+    scheduler = HistoricalNetworkScheduler()
+    values = MutableSignal()
+    buffer = BufferWithTime(scheduler, values, timedelta(milliseconds=100))
+    batches = []
+    Do(scheduler.get_network(), buffer, lambda: batches.append((round(scheduler.get_time(), 3), buffer.get_value())))
+
+    scheduler.schedule_update_at(values, 'a', 0.01)
+    scheduler.schedule_update_at(values, 'b', 0.05)
+    scheduler.schedule_update_at(values, 'c', 0.35)
+    scheduler.run(until=1.0)
+    assert batches == [(0.1, ['a', 'b']), (0.4, ['c'])]
+
+
+def test_historical_run_returns_with_periodic_timers():
+    scheduler = HistoricalNetworkScheduler()
+    values = From(scheduler, (float(x) for x in range(10)), batch_size=3)
+    buffer = BufferWithTime(scheduler, values, timedelta(seconds=1))
+    Interval(scheduler, timedelta(milliseconds=250))
+    batches = []
+    Do(scheduler.get_network(), buffer, lambda: batches.append(buffer.get_value()))
+
+    scheduler.schedule_update_at(values, 10.0, 2.5)
+    scheduler.run()
+    # the periodic timers fire once more after the last update, flushing the buffer, and then run() returns
+    assert batches == [[float(x) for x in range(10)], [10.0]]
+    assert scheduler.get_time() == 3.0
+
+
+def test_buffer_with_time_realtime():
+    batches = []
+
+    async def main():
+        scheduler = NetworkScheduler()
+        values = MutableSignal()
+        buffer = BufferWithTime(scheduler, values, timedelta(milliseconds=20))
+        Do(scheduler.get_network(), buffer, lambda: batches.append(buffer.get_value()))
+        scheduler.schedule_update(values, 1)
+        scheduler.schedule_update(values, 2)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert batches == [[1, 2]]
+
+
+def test_window_with_time():
+    scheduler = HistoricalNetworkScheduler()
+    values = MutableSignal()
+    window = WindowWithTime(scheduler, values, timedelta(seconds=1))
+    windows = []
+    Do(scheduler.get_network(), window, lambda: windows.append((scheduler.get_time(), window.get_value())))
+
+    scheduler.schedule_updates_at([(0.0, values, 1), (0.5, values, 2), (1.2, values, 3)])
+    scheduler.run()
+    assert windows == [(0.0, [1]), (0.5, [1, 2]), (1.0, [2]), (1.2, [2, 3]), (1.5, [3]), (2.2, [])]
+
+
+def test_sample_with_time():
+    scheduler = HistoricalNetworkScheduler()
+    values = MutableSignal()
+    sample = SampleWithTime(scheduler, values, timedelta(seconds=1))
+    samples = []
+    Do(scheduler.get_network(), sample, lambda: samples.append((scheduler.get_time(), sample.get_value())))
+
+    scheduler.schedule_updates_at([(0.2, values, 1), (0.7, values, 2), (2.5, values, 3)])
+    scheduler.run(until=4.0)
+    assert samples == [(1.0, 2), (3.0, 3)]
+
+
+def test_window_with_count():
+    scheduler = HistoricalNetworkScheduler()
+    values = From(scheduler, [1, 2, 3, 4, 5])
+    window = WindowWithCount(scheduler.get_network(), values, count=3)
+    windows = []
+    Do(scheduler.get_network(), window, lambda: windows.append(window.get_value()))
+    scheduler.run()
+    assert windows == [[1, 2, 3], [2, 3, 4], [3, 4, 5]]
+
+
+def test_window_with_count_live_view():
+    scheduler = HistoricalNetworkScheduler()
+    values = From(scheduler, [1, 2, 3, 4, 5])
+    window = WindowWithCount(scheduler.get_network(), values, count=3, live_view=True)
+    sums = []
+    Do(scheduler.get_network(), window, lambda: sums.append(sum(window.get_value())))
+    scheduler.run()
+    assert sums == [6, 9, 12]
+    assert list(window.get_value()) == [3, 4, 5]
+
+
+def test_window_with_count_array():
+    np = pytest.importorskip('numpy')
+    scheduler = HistoricalNetworkScheduler()
+    values = From(scheduler, [float(x) for x in range(10)])
+    window = WindowWithCount(scheduler.get_network(), values, count=4, live_view=True, dtype=np.float64)
+    means = []
+    Do(scheduler.get_network(), window, lambda: means.append(window.get_value().mean()))
+    scheduler.run()
+    assert means == [1.5, 2.5, 3.5, 4.5, 5.5, 6.5, 7.5]
+    assert window.get_value().tolist() == [6.0, 7.0, 8.0, 9.0]
+
+
+def test_batch_mode_matches_scalar():
+    np = pytest.importorskip('numpy')
+    data = np.random.default_rng(7).normal(0.0, 1.0, 500)
+
+    def run(make_values):
+        scheduler = HistoricalNetworkScheduler()
+        network = scheduler.get_network()
+        values = make_values(scheduler)
+        scaled = Map(network, values, lambda x: x * 3.0 + 1.0)
+        positive = Filter(network, scaled, lambda x: x > 0.0)
+        accumulator = Scan(network, positive)
+        outputs = []
+        Do(network, accumulator, lambda: outputs.append(accumulator.get_value()))
+        scheduler.run()
+        return outputs
+
+    scalar_outputs = run(lambda scheduler: From(scheduler, data.tolist()))
+    batch_outputs = run(lambda scheduler: FromArray(scheduler, data, chunk_size=64))
+    assert np.concatenate(batch_outputs).tolist() == scalar_outputs
+
+
+def test_fan_in_is_glitch_free():
+    class Spread(Function):
+        def __init__(self, network, bid, ask):
+            super().__init__(network, [bid, ask])
+            self.calls = 0
+
+        def _call(self):
+            self.calls += 1
+            self._update(self.parameters[1].get_value() - self.parameters[0].get_value())
+
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    mid = From(scheduler, [100.0, 101.0, 99.5])
+    bid = Map(network, mid, lambda x: x - 0.5)
+    ask = Map(network, Map(network, mid, lambda x: x + 0.25), lambda x: x + 0.25)
+    spread = Spread(network, bid, ask)
+    seen = []
+    Lambda(network, [bid, ask], lambda x: seen.append(x[1].get_value() - x[0].get_value()))
+    spreads = []
+    Do(network, spread, lambda: spreads.append(spread.get_value()))
+    scheduler.run()
+
+    assert spread.calls == 3
+    assert spreads == [1.0, 1.0, 1.0]
+    assert seen == [1.0, 1.0, 1.0]
+
+
+def test_from_async_iterable():
+    check_values = []
+    closed = []
+
+    async def main():
+        async def ticks():
+            try:
+                for x in range(1, 101):
+                    if x % 10 == 0:
+                        await asyncio.sleep(0)
+                    yield float(x)
+            finally:
+                closed.append(True)
+
+        scheduler = NetworkScheduler()
+        values = FromAsyncIterable(scheduler, ticks(), batch_size=16)
+        accumulator = Scan(scheduler.get_network(), values)
+        await values.task
+        check_values.extend([accumulator.get_value(), values.completed])
+
+    asyncio.run(main())
+    assert check_values == [5050.0, True]
+    assert closed == [True]
+
+
+def test_from_async_iterable_cancel():
+    check_values = []
+
+    async def main():
+        queue = asyncio.Queue()
+        scheduler = NetworkScheduler()
+        values = FromAsyncIterable(scheduler, queue)
+        accumulator = Scan(scheduler.get_network(), values)
+        for x in [1.0, 2.0, 3.0]:
+            queue.put_nowait(x)
+        await asyncio.sleep(0)
+        values.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await values.task
+        queue.put_nowait(4.0)
+        await asyncio.sleep(0)
+        check_values.extend([accumulator.get_value(), values.completed])
+
+    asyncio.run(main())
+    assert check_values == [6.0, True]
+
+
+def write_ticks(path):
+    np = pytest.importorskip('numpy')
+    ticks = np.zeros(1000, dtype=[('timestamp', 'f8'), ('price', 'f8'), ('size', 'i8')])
+    ticks['timestamp'] = np.arange(1000) * 0.5
+    ticks['price'] = 100.0 + np.arange(1000) % 7
+    ticks['size'] = 1 + np.arange(1000) % 3
+    np.save(path, ticks)
+    return ticks
+
+
+def test_from_tick_file(tmp_path):
+    path = str(tmp_path / 'ticks.npy')
+    ticks = write_ticks(path)
+
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    prices = FromTickFile(scheduler, path, value_field='price', chunk_size=64)
+    total = Scan(network, prices)
+    records = FromTickFile(scheduler, path, chunk_size=100)
+    sizes = Scan(network, Map(network, records, lambda record: float(record['size'])))
+    seen_at_timer = []
+    scheduler.schedule_timer(timedelta(seconds=100.25), lambda: seen_at_timer.append(total.get_value()))
+    scheduler.run()
+
+    assert total.get_value() == ticks['price'].sum()
+    assert sizes.get_value() == ticks['size'].sum()
+    assert seen_at_timer == [ticks['price'][:201].sum()]
+    assert scheduler.get_time() == 499.5
+
+
+def test_from_tick_file_batched(tmp_path):
+    path = str(tmp_path / 'ticks.npy')
+    ticks = write_ticks(path)
+
+    scheduler = HistoricalNetworkScheduler()
+    prices = FromTickFile(scheduler, path, value_field='price', chunk_size=128, batched=True)
+    total = Scan(scheduler.get_network(), prices)
+    scheduler.run()
+    assert total.get_value()[-1] == ticks['price'].sum()
+
+
+def test_from_tick_file_unsorted(tmp_path):
+    np = pytest.importorskip('numpy')
+    path = str(tmp_path / 'ticks.npy')
+    np.save(path, np.array([(1.0, 1.0), (0.5, 2.0)], dtype=[('timestamp', 'f8'), ('price', 'f8')]))
+    scheduler = HistoricalNetworkScheduler()
+    with pytest.raises(ValueError):
+        FromTickFile(scheduler, path, value_field='price')
+        scheduler.run()
+
+
+def test_from_tick_file_arrow(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'ticks.arrow')
+    table = pa.table({'timestamp': [1.0, 2.0, 3.0, 4.0], 'price': [10.0, 11.0, 12.0, 13.0]})
+    with pa.ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table, max_chunksize=3)
+
+    scheduler = HistoricalNetworkScheduler()
+    rows = FromTickFile(scheduler, path, chunk_size=2)
+    total = Scan(scheduler.get_network(), Map(scheduler.get_network(), rows, lambda row: row['price']))
+    scheduler.run()
+    assert total.get_value() == 46.0
+    assert scheduler.get_time() == 4.0
+
+
+def test_lazy_map():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    quotes = MutableSignal()
+    priced = LazyMap(network, quotes, lambda x: x * 10)
+    repriced = LazyMap(network, priced, lambda x: x + 1)
+    ticks = []
+    Do(network, repriced, lambda: ticks.append(quotes.get_value()))
+
+    for quote in [1, 2, 3]:
+        quotes.set_value(quote)
+        network.activate(quotes)
+    assert ticks == [1, 2, 3]
+    assert (priced.evaluations, repriced.evaluations) == (0, 0)
+
+    assert repriced.get_value() == 31
+    assert repriced.get_value() == 31
+    assert (priced.evaluations, repriced.evaluations) == (1, 1)
+
+    quotes.set_value(4)
+    network.activate(quotes)
+    assert priced.get_value() == 40
+    assert repriced.get_value() == 41
+    assert (priced.evaluations, repriced.evaluations) == (2, 2)
+
+
+def activate_all(network, updates):
+    for signal, value in updates:
+        signal.set_value(value)
+        network.activate(signal)
+
+
+def test_combine_latest():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    bid, ask = MutableSignal(), MutableSignal()
+    mid = Map(network, bid, lambda x: x + 0.5)
+    combined = CombineLatest(network, [bid, ask, mid])
+    emitted = []
+    Do(network, combined, lambda: emitted.append(combined.get_value()))
+
+    activate_all(network, [(bid, 1.0), (ask, 2.0), (bid, 1.5), (ask, 2.5)])
+    # bid and mid update in the same tick, so only one combined tuple results
+    assert emitted == [(1.0, 2.0, 1.5), (1.5, 2.0, 2.0), (1.5, 2.5, 2.0)]
+
+
+def test_with_latest_from():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    trades, quotes = MutableSignal(), MutableSignal()
+    joined = WithLatestFrom(network, trades, [quotes])
+    emitted = []
+    Do(network, joined, lambda: emitted.append(joined.get_value()))
+
+    activate_all(network, [(trades, 't1'), (quotes, 'q1'), (quotes, 'q2'), (trades, 't2'), (trades, 't3')])
+    assert emitted == [('t2', 'q2'), ('t3', 'q2')]
+
+
+def test_zip():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    a, b = MutableSignal(), MutableSignal()
+    zipped = Zip(network, [a, b], max_pending=2)
+    emitted = []
+    Do(network, zipped, lambda: emitted.append(zipped.get_value()))
+
+    activate_all(network, [(a, 1), (a, 2), (b, 'x'), (a, 3), (a, 4), (a, 5), (b, 'y'), (b, 'z'), (b, 'w')])
+    assert emitted == [(1, 'x'), (4, 'y'), (5, 'z')]
+
+
+def test_all_and_any_activated():
+    scheduler = HistoricalNetworkScheduler()
+    network = scheduler.get_network()
+    a, b = MutableSignal(), MutableSignal()
+    all_activated = AllActivated(network, [a, b])
+    any_activated = AnyActivated(network, [a, b])
+    seen = []
+    Do(network, all_activated, lambda: seen.append(('all', a.get_value(), b.get_value())))
+    Do(network, any_activated, lambda: seen.append('any'))
+
+    activate_all(network, [(a, 1), (a, 2), (b, 1), (a, 3), (b, 2)])
+    assert seen.count('any') == 5
+    assert [x for x in seen if x != 'any'] == [('all', 2, 1), ('all', 3, 2)]
+
+
+def build_pipeline(network, values):
+    parsed = Map(network, values, lambda x: x * 2)
+    positive = Filter(network, parsed, lambda x: x > 0)
+    total = Scan(network, Map(network, positive, lambda x: x + 1))
+    average = Mean(network, total)
+    # a second consumer of the Scan ends the first chain there and starts another
+    doubled = Map(network, Map(network, total, lambda x: x * 2), lambda x: x - 1)
+    return [parsed, positive, total, average, doubled]
+
+
+def test_fuse_chains_matches_unfused():
+    results = []
+    for fuse in [False, True]:
+        network = Network()
+        values = MutableSignal()
+        nodes = build_pipeline(network, values)
+        ticks = []
+        Do(network, nodes[3], lambda: ticks.append(nodes[3].get_value()))
+        Do(network, nodes[4], lambda: ticks.append(nodes[4].get_value()))
+        if fuse:
+            fused = fuse_chains(network)
+            assert [len(chain.stages) for chain in fused] == [4, 2]
+        for value in [1, -2, 3, 0, 5]:
+            values.set_value(value)
+            network.activate(values)
+        results.append((ticks, [node.get_value() for node in nodes], len(network.node_id_map)))
+
+    (unfused_ticks, unfused_values, unfused_nodes), (fused_ticks, fused_values, fused_nodes) = results
+    assert fused_ticks == unfused_ticks
+    assert fused_values == unfused_values
+    assert fused_nodes < unfused_nodes
+
+
+def test_async_map_ordering():
+    results = {}
+
+    async def main():
+        for ordered in [True, False]:
+            scheduler = NetworkScheduler()
+            values = MutableSignal()
+            running = []
+
+            async def slow_square(x):
+                running.append(x)
+                assert len(running) <= 2
+                await asyncio.sleep(0.05 if x == 1 else 0.01)
+                running.remove(x)
+                return x * x
+
+            squares = AsyncMap(scheduler, values, slow_square, max_in_flight=2, ordered=ordered)
+            emitted = results[ordered] = []
+            Do(scheduler.get_network(), squares, lambda: emitted.append(squares.get_value()))
+            for x in [1, 2, 3]:
+                scheduler.schedule_update(values, x)
+            await asyncio.sleep(0)
+            await squares.join()
+
+    asyncio.run(main())
+    assert results[True] == [1, 4, 9]
+    assert results[False] == [4, 9, 1]
+
+
+def test_async_map_executor():
+    emitted = []
+    errors = []
+
+    def parse(x):
+        if x == 'bad':
+            raise ValueError(x)
+        return int(x)
+
+    async def main():
+        asyncio.get_event_loop().set_exception_handler(lambda loop, context: errors.append(context['exception']))
+        scheduler = NetworkScheduler()
+        values = MutableSignal()
+        parsed = AsyncMap(scheduler, values, parse, executor=ThreadPoolExecutor(2))
+        Do(scheduler.get_network(), parsed, lambda: emitted.append(parsed.get_value()))
+        for x in ['1', 'bad', '3']:
+            scheduler.schedule_update(values, x)
+        await asyncio.sleep(0)
+        await parsed.join()
+        assert parsed.errors == 1
+
+    asyncio.run(main())
+    assert emitted == [1, 3]
+    assert [str(e) for e in errors] == ['bad']